@@ -3,11 +3,12 @@ import os
 import sys
 import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_login import current_user, login_required
-import networkx as nx
-from services.pdf_export import export_results_to_pdf
+from sqlalchemy.orm import load_only
 
 # ========== PATHS ==========
 BASE_DIR = Path(__file__).resolve().parent.parent  # Project root
@@ -15,6 +16,9 @@ FRONTEND_DIR = BASE_DIR / "frontend"
 BACKEND_DIR = BASE_DIR / "backend"
 SRC_DIR = BACKEND_DIR / "src"
 
+# Browser cache lifetime for CSS/JS/images served from the frontend folder
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 86400))
+
 # Add src to path for imports
 if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
@@ -27,14 +31,14 @@ from models import User
 from auth.routes import auth_bp
 
 # ========== NLP MODULES ==========
-from src.nlp.extract import get_nlp, extract_keyphrases
-from src.nlp.relationships import build_cooccurrence_graph, extract_svo_edges
-from src.nlp.hierarchy import build_hierarchy_tree
+# spaCy, networkx and reportlab are imported inside the views that use them,
+# so startup, static files and /api/health do not pay for loading them
 
 # ========== OCR & SERVICES ==========
-from services.ocr_pipeline import OCRConfig, extract_text_smart
+from services.ocr_pipeline import OCRConfig, SNIFF_BYTES, extract_text_from_bytes, sniff_file_kind
 from services.llm_post import llm_clean_and_structure, extract_mindmap_with_gemini
 from services.structure_utils import filter_concepts, bullets_to_graph, relations_to_graph
+from services.cache import get_cache
 
 # ========== LOGGING ==========
 logging.basicConfig(
@@ -43,14 +47,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upper bound on files OCR'd in parallel (keeps the Vision client from being flooded)
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", 8))
+
+# Longest slice of the combined OCR text any later step uses
+MAX_COMBINED_CHARS = 50000
+
+# spaCy worker processes for the keyphrase fallback (capped at 2 for memory)
+NLP_PROCESSES = max(1, min(2, int(os.getenv("NLP_PROCESSES", 1))))
+
+# Shared pool for overlapping Gemini requests within a single /api/process call
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_WORKERS", 4)))
+
+# Characters that break vis.js label regexes: slashes become spaces, the rest are dropped
+_LABEL_TRANSLATION = str.maketrans({
+    **{c: None for c in "()[]{}$^*+?|"},
+    "/": " ",
+    "\\": " ",
+})
+
+def sanitize_label(label):
+    """Clean label to prevent JavaScript regex errors"""
+    if not label:
+        return "Node"
+    
+    # Remove problematic regex special characters in a single pass
+    label = str(label).translate(_LABEL_TRANSLATION)
+    
+    # Truncate if too long
+    if len(label) > 50:
+        label = label[:47] + "..."
+    
+    # Clean up spaces (split/join already strips the ends)
+    label = ' '.join(label.split())
+    
+    return label or "Node"
+
+# Uploads up to this size stay in memory while the request is parsed
+UPLOAD_SPOOL_MAX = int(os.getenv("UPLOAD_SPOOL_MAX", 16 * 1024 * 1024))
+
+class SpooledRequest(Request):
+    """Request that buffers uploaded files in memory until UPLOAD_SPOOL_MAX"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX, mode="rb+")
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that parses request bodies and serializes responses with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+class FrontendFlask(Flask):
+    """Flask app whose frontend files carry browser cache lifetimes"""
+
+    def get_send_file_max_age(self, filename):
+        # HTML always revalidates via ETag; other assets are not fingerprinted,
+        # so they get a bounded max-age rather than "immutable"
+        if filename and filename.endswith(".html"):
+            return 0
+        return STATIC_MAX_AGE
+
 # ========== CREATE FLASK APP ==========
 def create_app():
     """Create and configure Flask application"""
-    app = Flask(
+    app = FrontendFlask(
         __name__,
         static_folder=str(FRONTEND_DIR),
         static_url_path=''
     )
+    app.request_class = SpooledRequest
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
     
     # ===== CONFIGURATION =====
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
@@ -69,7 +148,6 @@ def create_app():
     
     # Upload settings
     app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024  # 100 MB max
-    app.config["JSON_AS_ASCII"] = False
     
     # ===== INITIALIZE EXTENSIONS =====
     db.init_app(app)
@@ -95,10 +173,16 @@ def after_request(response):
     return response
 
 # ========== USER LOADER ==========
+_USER_SESSION_COLUMNS = (
+    User.id, User.email, User.username, User.created_at,
+    User.last_login, User.is_active, User.is_admin,
+)
+
 @login_manager.user_loader
 def load_user(user_id):
     """Load user by ID for Flask-Login"""
-    return db.session.get(User, int(user_id))
+    # Only the columns requests actually read; password_hash loads lazily if needed
+    return db.session.get(User, int(user_id), options=[load_only(*_USER_SESSION_COLUMNS)])
 
 # ========== FRONTEND ROUTES ==========
 @app.route("/")
@@ -119,6 +203,11 @@ def serve_static(filename):
 app.register_blueprint(auth_bp)
 
 # ========== MAIN PROCESSING API ==========
+def _ocr_one(filename: str, data: bytes, kind: str, cfg: OCRConfig) -> str:
+    """OCR a single in-memory upload of the sniffed kind; runs inside the worker pool"""
+    logger.info(f"Processing file: {filename}")
+    return extract_text_from_bytes(data, filename, cfg, kind)
+
 @app.route("/api/process", methods=["POST"])
 def api_process():
     """
@@ -141,34 +230,53 @@ def api_process():
         file_results: list[dict] = []
 
         # ========== STEP 1: OCR EXTRACTION ==========
+        cfg = OCRConfig(
+            engine=ocr_engine,
+            lang=lang,
+            dpi=400,
+            deskew=True,
+            denoise=True,
+            binarize=True,
+            morph=True,
+        )
+
+        uploads: list[tuple[str, bytes, str]] = []
         for file in files:
             if not file or not file.filename:
                 continue
 
-            filename = file.filename
-            logger.info(f"Processing file: {filename}")
-
-            suffix = Path(filename).suffix.lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                file.save(tmp.name)
-                temp_path = tmp.name
+            # Reject non-image/PDF uploads before they reach OCR or Gemini
+            head = file.stream.read(SNIFF_BYTES)
+            file.stream.seek(0)
+            kind = sniff_file_kind(head)
+            if kind is None:
+                logger.warning(f"Unsupported file type: {file.filename}")
+                file_results.append({
+                    "filename": file.filename,
+                    "status": "unsupported",
+                    "error": "Unsupported file type (expected an image or PDF)",
+                })
+                continue
 
-            try:
-                cfg = OCRConfig(
-                    engine=ocr_engine,
-                    lang=lang,
-                    dpi=400,
-                    deskew=True,
-                    denoise=True,
-                    binarize=True,
-                    morph=True,
-                )
+            # Spooled in memory by SpooledRequest; no temp file round-trip
+            uploads.append((file.filename, file.read(), kind))
 
-                raw_text = extract_text_smart(temp_path, cfg)
+        # OCR is network/subprocess bound, so files are processed concurrently
+        workers = max(1, min(OCR_MAX_WORKERS, len(uploads)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_ocr_one, filename, data, kind, cfg) for filename, data, kind in uploads]
 
-                if isinstance(raw_text, dict):
-                    logger.warning("extract_text_smart returned dict; using 'text' field")
-                    raw_text = str(raw_text.get("text", ""))
+            for (filename, _, _), future in zip(uploads, futures):
+                try:
+                    raw_text = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {filename}: {e}")
+                    file_results.append({
+                        "filename": filename,
+                        "status": "error",
+                        "error": str(e),
+                    })
+                    continue
 
                 if not raw_text or len(raw_text.strip()) < 10:
                     logger.warning(f"No text extracted from {filename}")
@@ -192,32 +300,27 @@ def api_process():
                     "text_length": len(raw_text),
                 })
 
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {e}")
-                file_results.append({
-                    "filename": filename,
-                    "status": "error",
-                    "error": str(e),
-                })
-            finally:
-                if os.path.exists(temp_path):
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-
-        combined_text = "\n\n".join(all_text)
-        if not combined_text.strip():
+        # Every file kept above has real text, so an empty list means nothing was extracted
+        if not all_text:
             return jsonify({
                 "error": "No text could be extracted from any file",
                 "files": file_results,
             }), 400
 
-        logger.info(f"Total extracted text: {len(combined_text)} characters")
+        # Nothing downstream reads past MAX_COMBINED_CHARS, so only join the files needed to reach it
+        total_chars = sum(map(len, all_text)) + 2 * (len(all_text) - 1)
+        needed, covered = 0, 0
+        while needed < len(all_text) and covered < MAX_COMBINED_CHARS:
+            covered += len(all_text[needed]) + 2
+            needed += 1
+        combined_text = "\n\n".join(all_text[:needed])
+
+        logger.info(f"Total extracted text: {total_chars} characters")
 
         # ========== STEP 2: GEMINI AI PROCESSING ==========
+        text_for_llm = combined_text[:20000]
+
         try:
-            text_for_llm = combined_text[:20000]
             logger.info("🤖 Sending to Gemini AI for processing...")
             structured = llm_clean_and_structure(text_for_llm, summary_level=summary_level)
             
@@ -237,7 +340,12 @@ def api_process():
             gemini_concepts = []
             gemini_relations = []
 
-        clean_text = structured.get("clean_text") or combined_text[:50000]
+        clean_text = structured.get("clean_text") or combined_text[:MAX_COMBINED_CHARS]
+
+        # The mindmap is built from Gemini's cleaned text, so it waits for the structuring
+        # call; this network wait then overlaps with the keyphrase extraction below
+        logger.info("🧠 Building mindmap with Gemini AI...")
+        mindmap_future = LLM_EXECUTOR.submit(extract_mindmap_with_gemini, clean_text, max_concepts=15)
 
         # ========== STEP 3: EXTRACT KEY CONCEPTS ==========
         keyphrases = []
@@ -255,17 +363,39 @@ def api_process():
         if not keyphrases:
             try:
                 logger.info("📊 Falling back to spaCy NLP...")
-                nlp_model = get_nlp()
-                doc = nlp_model(clean_text[:30000])
-                keyphrases = extract_keyphrases(doc, top_k=top_k)
-                
-                filtered = []
-                seen = set()
-                for kp in keyphrases:
-                    phrase = (kp.get("phrase") or "").strip()
-                    if phrase and len(phrase) >= 3 and phrase.lower() not in seen:
-                        seen.add(phrase.lower())
-                        filtered.append(kp)
+                from src.nlp.extract import KEYPHRASE_DISABLED_PIPES, get_nlp, extract_keyphrases, pipe_cached
+
+                # Parse each file separately in one nlp.pipe batch when there are several
+                if len(all_text) > 1:
+                    nlp_texts = [t[:30000] for t in all_text]
+                else:
+                    nlp_texts = [clean_text[:30000]]
+
+                nlp_model = get_nlp()  # cached, loaded once per process
+                docs = pipe_cached(
+                    nlp_model, nlp_texts, get_cache("nlp"),
+                    n_process=NLP_PROCESSES, disable=KEYPHRASE_DISABLED_PIPES,
+                )
+
+                # Merge per-document keyphrases, summing scores of repeated phrases
+                merged: dict[str, tuple[str, float]] = {}
+                for doc in docs:
+                    for phrase, score in extract_keyphrases(doc, top_k=top_k):  # reuses the parsed Doc
+                        phrase = (phrase or "").strip()
+                        if phrase and len(phrase) >= 3:
+                            prev = merged.get(phrase.lower())
+                            merged[phrase.lower()] = (prev[0], prev[1] + score) if prev else (phrase, score)
+
+                ranked = sorted(merged.values(), key=lambda x: x[1], reverse=True)[:top_k]
+                top_score = ranked[0][1] if ranked else 1.0
+
+                filtered = [
+                    {
+                        "phrase": phrase,
+                        "score": round(score / top_score, 3) if top_score else 0.0,
+                    }
+                    for phrase, score in ranked
+                ]
                 
                 keyphrases = filtered
                 logger.info(f"✅ NLP extracted {len(keyphrases)} concepts")
@@ -283,10 +413,11 @@ def api_process():
             ]
 
         # ========== STEP 4: BUILD MINDMAP WITH GEMINI ==========
+        import networkx as nx
+
+        gemini_mindmap = None
         try:
-            logger.info("🧠 Building mindmap with Gemini AI...")
-            
-            gemini_mindmap = extract_mindmap_with_gemini(clean_text, max_concepts=15)
+            gemini_mindmap = mindmap_future.result()
             
             if gemini_mindmap and gemini_mindmap.get('central'):
                 graph = nx.DiGraph()
@@ -304,7 +435,7 @@ def api_process():
                                 graph.add_node(sub)
                                 graph.add_edge(branch_name, sub)
                 
-                logger.info(f"✅ Built mindmap from Gemini: {len(graph.nodes())} nodes")
+                logger.info(f"✅ Built mindmap from Gemini: {graph.number_of_nodes()} nodes")
             else:
                 raise Exception("Gemini mindmap structure invalid")
                 
@@ -331,52 +462,28 @@ def api_process():
             else:
                 graph.add_node("Content")
 
-        logger.info(f"📊 Final graph: {len(graph.nodes())} nodes, {len(graph.edges())} edges")
+        logger.info(f"📊 Final graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
 
         # ========== STEP 5: CONVERT TO VIS.JS FORMAT WITH SANITIZATION ==========
-        node_list = list(graph.nodes())
-        node_to_id = {node: str(i) for i, node in enumerate(node_list)}
-
-        def sanitize_label(label):
-            """Clean label to prevent JavaScript regex errors"""
-            if not label:
-                return "Node"
-            
-            label = str(label)
-            
-            # Remove problematic regex special characters
-            label = label.replace('(', '').replace(')', '')
-            label = label.replace('[', '').replace(']', '')
-            label = label.replace('{', '').replace('}', '')
-            label = label.replace('/', ' ').replace('\\', ' ')
-            label = label.replace('$', '').replace('^', '')
-            label = label.replace('*', '').replace('+', '')
-            label = label.replace('?', '').replace('|', '')
-            
-            # Truncate if too long
-            if len(label) > 50:
-                label = label[:47] + "..."
-            
-            # Clean up spaces
-            label = ' '.join(label.split())
-            
-            return label.strip() if label.strip() else "Node"
+        # One pass assigns ids and builds the node list together
+        node_to_id = {}
+        nodes_out = []
+        for i, node in enumerate(graph.nodes()):
+            sid = str(i)
+            node_to_id[node] = sid
+            nodes_out.append({"id": sid, "label": sanitize_label(node)})
 
         mindmap_data = {
-            "nodes": [
-                {
-                    "id": node_to_id[node], 
-                    "label": sanitize_label(node)
-                }
-                for node in node_list
-            ],
+            "nodes": nodes_out,
             "edges": [
                 {
                     "from": node_to_id[u], 
                     "to": node_to_id[v], 
                     "label": ""
                 }
-                for u, v in graph.edges()
+                # Walk the adjacency dicts directly instead of the EdgeView
+                for u, nbrs in graph.adjacency()
+                for v in nbrs
             ],
         }
 
@@ -397,12 +504,12 @@ def api_process():
                 "ocr_engine": ocr_engine,
                 "files_processed": len(file_results),
                 "files_success": sum(1 for f in file_results if f["status"] == "success"),
-                "total_chars": len(combined_text),
+                "total_chars": total_chars,
                 "concept_count": len(keyphrases),
-                "graph_nodes": len(node_list),
-                "graph_edges": len(graph.edges()),
+                "graph_nodes": len(nodes_out),
+                "graph_edges": len(mindmap_data["edges"]),
                 "used_gemini_concepts": len(gemini_concepts) > 0,
-                "used_gemini_mindmap": gemini_mindmap is not None if 'gemini_mindmap' in locals() else False,
+                "used_gemini_mindmap": gemini_mindmap is not None,
             },
             "files": file_results,
         }
@@ -428,6 +535,9 @@ def api_export_pdf():
         
         logger.info("📄 Generating PDF export...")
         
+        # Lays out the /api/process results as posted; nothing is re-parsed with spaCy here,
+        # so there is no Doc to rehydrate (repeat parses go through parse_cached instead)
+        from services.pdf_export import export_results_to_pdf
         pdf_bytes = export_results_to_pdf(data)
         
         logger.info(f"✅ PDF exported: {len(pdf_bytes)} bytes")
@@ -27,6 +27,11 @@ def _serialize_user(u: User):
         "is_admin": u.is_admin,
     }
 
+def _login(u: User) -> dict:
+    """Log the user in and return their serialized profile"""
+    login_user(u, remember=True)
+    return _serialize_user(u)
+
 @auth_bp.post("/register")
 def register():
     email = (_get("email") or "").strip().lower()
@@ -41,9 +46,13 @@ def register():
     if len(password) < 6:
         return jsonify({"ok": False, "error": "Password must be at least 6 characters"}), 400
 
-    if User.query.filter_by(email=email).first():
+    # One query for both uniqueness checks, then see which field collided
+    taken = User.query.with_entities(User.email, User.username).filter(
+        or_(User.email == email, User.username == username)
+    ).all()
+    if any(row.email == email for row in taken):
         return jsonify({"ok": False, "error": "Email is already registered"}), 400
-    if User.query.filter_by(username=username).first():
+    if taken:
         return jsonify({"ok": False, "error": "Username is already taken"}), 400
 
     u = User(email=email, username=username)
@@ -51,8 +60,7 @@ def register():
     db.session.add(u)
     db.session.commit()
 
-    login_user(u, remember=True)
-    return jsonify({"ok": True, "user": _serialize_user(u)})
+    return jsonify({"ok": True, "user": _login(u)})
 
 @auth_bp.post("/login")
 def login():
@@ -77,12 +85,12 @@ def login():
     user.last_login = datetime.utcnow()
     db.session.commit()
     
-    # Log the user in with Flask-Login
-    login_user(user, remember=True)  # Add remember=True for persistent session
+    # Log the user in with Flask-Login (remember=True for persistent session)
+    user_data = _login(user)
     
     return jsonify({
         "ok": True,
-        "user": _serialize_user(user),
+        "user": user_data,
         "message": "Login successful"
     }), 200
 
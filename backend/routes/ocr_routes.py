@@ -1,9 +1,10 @@
 # routes/ocr_routes.py
 from __future__ import annotations
-import os, tempfile
+import io, os, tempfile
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify
 
-from services.ocr_pipeline import OCRConfig, extract_text_smart, top_concepts
+from services.ocr_pipeline import OCRConfig, SNIFF_BYTES, extract_text_smart, sniff_file_kind, top_concepts
 from services.llm_post import llm_clean_and_structure
 
 ocr_bp = Blueprint("ocr_bp", __name__, url_prefix="/ocr")
@@ -17,6 +18,42 @@ def _to_bool(v, default=False):
     return str(v).lower().strip() in {"1", "true", "yes", "on"}
 
 
+COPY_BUFFER = 1 << 20  # 1 MiB chunks instead of FileStorage.save's 16 KiB
+
+
+def _real_fileno(stream):
+    """OS file descriptor behind an upload stream, or None if it lives in memory"""
+    # SpooledTemporaryFile.fileno() would force a rollover; look at the wrapped file instead
+    stream = getattr(stream, "_file", stream)
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _save(f, tmpdir: str, index: int) -> str:
+    # Index prefix keeps same-named uploads from clobbering each other
+    path = os.path.join(tmpdir, f"{index}_{os.path.basename(f.filename or 'upload')}")
+
+    src_fd = _real_fileno(f.stream) if hasattr(os, "sendfile") else None
+    if src_fd is None:
+        f.save(path, buffer_size=COPY_BUFFER)
+        return path
+
+    # Upload already on disk: copy kernel-side, starting at the stream's position
+    f.stream.flush()
+    offset = f.stream.tell()
+    remaining = os.fstat(src_fd).st_size - offset
+    with open(path, "wb") as dst:
+        while remaining > 0:
+            sent = os.sendfile(dst.fileno(), src_fd, offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+    return path
+
+
 @ocr_bp.route("/process", methods=["POST"])
 def process_ocr():
     files = request.files.getlist("files")
@@ -40,16 +77,31 @@ def process_ocr():
     top_k = int(request.form.get("top_k_concepts", 12))
     gemini_model = request.form.get("gemini_model")
 
-    texts, engines = [], []
+    uploads, rejected = [], []
+    for f in files:
+        head = f.stream.read(SNIFF_BYTES)
+        f.stream.seek(0)
+        kind = sniff_file_kind(head)
+        if kind is None:
+            rejected.append(f.filename)
+        else:
+            uploads.append((f, kind))
+    if not uploads:
+        return jsonify({
+            "ok": False,
+            "error": "Unsupported file type (expected an image or PDF)",
+            "rejected": rejected,
+        }), 415
+
     with tempfile.TemporaryDirectory() as tmpdir:
-        for f in files:
-            path = os.path.join(tmpdir, f.filename or "upload")
-            f.save(path)
-            res = extract_text_smart(path, cfg)
-            texts.append(res["text"])
-            engines.append(res["engine_used"])
-
-    extracted_text = "\n\n".join(t for t in texts if t).strip()
+        # Save + OCR each file in parallel; map() keeps upload order
+        with ThreadPoolExecutor(max_workers=min(8, len(uploads))) as executor:
+            texts = list(executor.map(
+                lambda item: extract_text_smart(_save(item[1][0], tmpdir, item[0]), cfg, item[1][1]),
+                enumerate(uploads),
+            ))
+
+    extracted_text = "\n\n".join(filter(None, texts)).strip()
     llm_out = llm_clean_and_structure(
         extracted_text,
         summary_level=summary_level,
@@ -57,12 +109,19 @@ def process_ocr():
         model_name=gemini_model
     )
 
-    concepts = top_concepts(llm_out.get("clean_text") or extracted_text, k=top_k)
+    # Gemini already returns concepts; only run spaCy when it produced none.
+    # Gemini's list is ranked but unscored, so only spaCy's keyphrases carry a "score"
+    concepts = [
+        {"phrase": c} for c in llm_out.get("bullet_points", [])[:top_k]
+    ] or top_concepts(llm_out.get("clean_text") or extracted_text, top_n=top_k)
 
     return jsonify({
         "ok": True,
-        "engine_used": list(set(engines or ["none"]))[0],
+        # Every page runs cfg.engine (there is no per-page fallback), so that is the only
+        # engine to report, and only when some file actually yielded text
+        "engine_used": cfg.engine if extracted_text else "none",
         "extracted_text": extracted_text,
         "top_concepts": concepts,
+        "rejected": rejected,
         "llm": llm_out
     })
\ No newline at end of file
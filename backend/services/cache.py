@@ -0,0 +1,103 @@
+# services/cache.py
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# ========== CACHE LOCATION ==========
+BASE_DIR = Path(__file__).resolve().parent.parent.parent  # Project root
+CACHE_DIR = Path(os.getenv("CACHE_DIR", BASE_DIR / "instance" / "cache"))
+
+
+def content_key(*parts: Any) -> str:
+    """SHA-256 hex digest over the given parts (str/bytes/other via str())"""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = str(part).encode("utf-8")
+        h.update(part)
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class _MemoryCache:
+    """Small thread-safe LRU used when diskcache is not installed"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value, expire=None):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return True
+
+
+_CACHES: dict = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(name: str):
+    """
+    Return the named cache, creating it on first use
+    Uses diskcache under CACHE_DIR (shared across workers), else an in-process LRU
+    """
+    with _CACHES_LOCK:
+        cache = _CACHES.get(name)
+        if cache is not None:
+            return cache
+
+        try:
+            import diskcache
+            cache = diskcache.Cache(str(CACHE_DIR / name))
+        except Exception as e:
+            logger.warning(f"Disk cache unavailable for '{name}' ({e}), using in-memory cache")
+            cache = _MemoryCache()
+
+        _CACHES[name] = cache
+        return cache
+
+
+def get_json(cache, key: str) -> Optional[Any]:
+    """Fetch and decode a JSON value, None on miss or bad entry"""
+    try:
+        raw = cache.get(key)
+        if raw is None:
+            return None
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except Exception as e:
+        logger.warning(f"Cache read failed: {e}")
+        return None
+
+
+def set_json(cache, key: str, value: Any, expire: Optional[float] = None) -> None:
+    """Encode and store a JSON value (expire: seconds, None keeps it); cache errors never fail the request"""
+    try:
+        raw = orjson.dumps(value) if orjson is not None else json.dumps(value, ensure_ascii=False)
+        cache.set(key, raw, expire=expire)
+    except Exception as e:
+        logger.warning(f"Cache write failed: {e}")
@@ -1,34 +1,56 @@
 # services/llm_post.py
 import os
+import time
 import logging
-import google.generativeai as genai
-from typing import Dict, List, Any
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+from services.cache import content_key, get_cache, get_json, set_json
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    logger.info("✅ Gemini API configured")
 
-def llm_clean_and_structure(text: str, summary_level: str = "normal") -> Dict[str, Any]:
-    """
-    Use Gemini to clean, summarize, and extract structure from text
-    """
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = f"""You are analyzing educational/technical notes. Please process this text and provide:
+# Seconds a cached Gemini answer stays valid (0 = never expires)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)) or None
+
+_cache_stats = Counter()
+
+def _cache_lookup(kind: str, cache_key: str):
+    cached = get_json(get_cache("llm"), cache_key)
+    _cache_stats["hit" if cached is not None else "miss"] += 1
+    logger.info(
+        f"Gemini {kind} cache {'hit' if cached is not None else 'miss'} "
+        f"(hits={_cache_stats['hit']}, misses={_cache_stats['miss']})"
+    )
+    return cached
+
+@lru_cache(maxsize=1)
+def _genai():
+    """Import and configure the Gemini SDK on first use (it is slow to import)"""
+    import google.generativeai as genai
+    if GEMINI_API_KEY:
+        genai.configure(api_key=GEMINI_API_KEY)
+        logger.info("✅ Gemini API configured")
+    return genai
+
+@lru_cache(maxsize=8)
+def _get_model(name: str, system_instruction: Optional[str] = None):
+    """Reuse one GenerativeModel handle per (model, instructions)"""
+    return _genai().GenerativeModel(name, system_instruction=system_instruction)
+
+# ========== STRUCTURE PROMPT ==========
+# Invariant part of the structure prompt; sent as system_instruction so only the notes vary per call
+_STRUCTURE_INSTRUCTIONS = """You are analyzing educational/technical notes. Please process the text you are given and provide:
 
 1. CLEANED TEXT: Rewrite the text with proper formatting, fixing OCR errors, and organizing into clear paragraphs
 2. SUMMARY: A concise {summary_level} summary (2-3 sentences)
 3. KEY CONCEPTS: Extract 10-15 main concepts/topics (just the concept names, comma-separated)
 4. RELATIONSHIPS: Identify 5-10 relationships between concepts in format "Concept A -> relates to -> Concept B"
 
-TEXT TO ANALYZE:
-{text[:15000]}
-
 Respond in this exact format:
 CLEANED_TEXT:
 [your cleaned text here]
@@ -44,13 +66,86 @@ RELATIONSHIPS:
 [Concept C -> Concept D]
 ..."""
 
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 3600))
+
+# (model_name, summary_level) -> (model handle, monotonic expiry)
+_structure_models: Dict[tuple, tuple] = {}
+
+def _structure_model(model_name: str, summary_level: str):
+    """
+    Model handle carrying the structure instructions
+    Uses a Gemini explicit context cache when the API accepts one; the instructions are
+    below its minimum token count on current models, so this normally falls back to a
+    plain system_instruction (still eligible for implicit prefix caching)
+    """
+    key = (model_name, summary_level)
+    entry = _structure_models.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+
+    genai = _genai()
+    instruction = _STRUCTURE_INSTRUCTIONS.format(summary_level=summary_level)
+    try:
+        cached = genai.caching.CachedContent.create(
+            model=model_name,
+            system_instruction=instruction,
+            ttl=f"{CONTEXT_CACHE_TTL}s",
+        )
+        model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        expires = time.monotonic() + CONTEXT_CACHE_TTL - 60  # renew before the server drops it
+        logger.info(f"Gemini context cache created for {key}")
+    except Exception as e:
+        logger.info(f"Gemini context cache unavailable ({e}), using system_instruction")
+        model = _get_model(model_name, instruction)
+        expires = float("inf")
+
+    _structure_models[key] = (model, expires)
+    return model
+
+# Blank pages / OCR noise below this many characters are not worth a Gemini round trip
+MIN_LLM_CHARS = int(os.getenv("MIN_LLM_CHARS", 50))
+
+def _fallback(text: str) -> Dict[str, Any]:
+    """Structure result used when Gemini is skipped or fails"""
+    return {
+        "clean_text": text[:5000],
+        "summary": "Text extracted successfully.",
+        "bullet_points": [],
+        "relations": []
+    }
+
+def llm_clean_and_structure(
+    text: str,
+    summary_level: str = "normal",
+    top_k_concepts: Optional[int] = None,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Use Gemini to clean, summarize, and extract structure from text
+    Identical inputs are answered from the LLM cache
+    top_k_concepts: optional cap on returned bullet_points
+    """
+    if len(text.strip()) < MIN_LLM_CHARS:
+        logger.info("Text too short for Gemini, skipping structure call")
+        return _fallback(text)
+
+    model_name = model_name or DEFAULT_MODEL
+    cache_key = content_key("structure", model_name, summary_level, text)
+    cached = _cache_lookup("structure", cache_key)
+    if cached is not None:
+        return _limit_concepts(cached, top_k_concepts)
+
+    try:
+        model = _structure_model(model_name, summary_level)
+        prompt = f"TEXT TO ANALYZE:\n{text[:15000]}"
+
         response = model.generate_content(prompt)
         result_text = response.text
         
         # Parse the response
         sections = {
-            "clean_text": "",
-            "summary": "",
+            "clean_text": [],
+            "summary": [],
             "key_concepts": [],
             "relationships": []
         }
@@ -78,9 +173,9 @@ RELATIONSHIPS:
                 continue
                 
             if current_section == 'clean_text':
-                sections['clean_text'] += line + '\n'
+                sections['clean_text'].append(line)
             elif current_section == 'summary':
-                sections['summary'] += line + ' '
+                sections['summary'].append(line)
             elif current_section == 'key_concepts':
                 # Parse comma-separated concepts
                 concepts = [c.strip() for c in line.split(',')]
@@ -91,34 +186,48 @@ RELATIONSHIPS:
                     sections['relationships'].append(line)
         
         # Clean up
-        sections['clean_text'] = sections['clean_text'].strip()
-        sections['summary'] = sections['summary'].strip()
+        sections['clean_text'] = '\n'.join(sections['clean_text']).strip()
+        sections['summary'] = ' '.join(sections['summary']).strip()
         
         logger.info(f"Gemini extracted {len(sections['key_concepts'])} concepts and {len(sections['relationships'])} relationships")
         
-        return {
+        result = {
             "clean_text": sections['clean_text'] or text[:5000],
             "summary": sections['summary'] or "Text processed successfully.",
             "bullet_points": sections['key_concepts'],
             "relations": sections['relationships']
         }
+        set_json(get_cache("llm"), cache_key, result, expire=LLM_CACHE_TTL)
+        return _limit_concepts(result, top_k_concepts)
         
     except Exception as e:
         logger.error(f"Gemini processing failed: {e}")
-        return {
-            "clean_text": text[:5000],
-            "summary": "Text extracted successfully.",
-            "bullet_points": [],
-            "relations": []
-        }
+        return _fallback(text)
+
+
+def _limit_concepts(result: Dict[str, Any], top_k: Optional[int]) -> Dict[str, Any]:
+    """Cache stores the full concept list; callers may ask for fewer"""
+    if not top_k or len(result.get("bullet_points", [])) <= top_k:
+        return result
+    return {**result, "bullet_points": result["bullet_points"][:top_k]}
 
 
 def extract_mindmap_with_gemini(text: str, max_concepts: int = 12) -> Dict[str, Any]:
     """
     Use Gemini to directly generate a mindmap structure
+    Identical inputs are answered from the LLM cache
     """
+    if len(text.strip()) < MIN_LLM_CHARS:
+        logger.info("Text too short for Gemini, skipping mindmap call")
+        return None
+
+    cache_key = content_key("mindmap", DEFAULT_MODEL, max_concepts, text)
+    cached = _cache_lookup("mindmap", cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = _get_model(DEFAULT_MODEL)
         
         prompt = f"""Analyze this educational/technical content and create a hierarchical mindmap.
 
@@ -154,16 +263,16 @@ BRANCH: [branch name]
                 continue
                 
             if line.startswith('CENTRAL:'):
-                central = line.replace('CENTRAL:', '').strip()
+                central = line[len('CENTRAL:'):].strip()
             elif line.startswith('BRANCH:'):
                 if current_branch:
                     branches.append(current_branch)
                 current_branch = {
-                    'name': line.replace('BRANCH:', '').strip(),
+                    'name': line[len('BRANCH:'):].strip(),
                     'subs': []
                 }
             elif line.startswith('SUB:') and current_branch:
-                sub = line.replace('SUB:', '').strip()
+                sub = line[len('SUB:'):].strip()
                 current_branch['subs'].append(sub)
         
         if current_branch:
@@ -173,10 +282,12 @@ BRANCH: [branch name]
         if not central:
             return None
             
-        return {
+        result = {
             'central': central,
             'branches': branches
         }
+        set_json(get_cache("llm"), cache_key, result, expire=LLM_CACHE_TTL)
+        return result
         
     except Exception as e:
         logger.error(f"Gemini mindmap generation failed: {e}")
@@ -1,47 +1,98 @@
 # services/ocr.py
+from __future__ import annotations
 import os
 import io
+import itertools
+import json
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from PIL import Image
 import logging
 
 logger = logging.getLogger(__name__)
 
 # ========== GOOGLE CLOUD VISION ==========
-_GCV_CLIENT = None
+# Each client owns its own gRPC channel; spreading calls over a few avoids
+# queueing concurrent page RPCs behind one HTTP/2 connection
+GCV_CLIENT_POOL = int(os.getenv("GCV_CLIENT_POOL", 4))
+_GCV_CLIENTS: list = []
+_GCV_LOCK = threading.Lock()
+_GCV_NEXT = itertools.count()
+
+# Upper bound on Vision RPCs in flight across all request threads
+GCV_MAX_INFLIGHT = int(os.getenv("GCV_MAX_INFLIGHT", 8))
+_GCV_INFLIGHT = threading.BoundedSemaphore(GCV_MAX_INFLIGHT)
+
+@lru_cache(maxsize=1)
+def _gcv_retry():
+    """Exponential backoff for quota (429) and transient Vision errors"""
+    from google.api_core import exceptions, retry
+    return retry.Retry(
+        predicate=retry.if_exception_type(
+            exceptions.ResourceExhausted,
+            exceptions.ServiceUnavailable,
+            exceptions.DeadlineExceeded,
+        ),
+        initial=1.0,
+        maximum=30.0,
+        multiplier=2.0,
+        timeout=120.0,
+    )
+
+@lru_cache(maxsize=16)
+def _image_context(lang: str | None):
+    """Per-language Vision ImageContext, built once (requests copy it, so one instance is shared)"""
+    if not lang:
+        return None
+    from google.cloud import vision
+    return vision.ImageContext(language_hints=[lang])
 
 def _ensure_gcv_client():
-    """Initialize Google Cloud Vision client (lazy loading)"""
-    global _GCV_CLIENT
-    if _GCV_CLIENT is not None:
-        return _GCV_CLIENT
-    
+    """Return a Google Cloud Vision client from a lazily created round-robin pool"""
+    if not _GCV_CLIENTS:
+        with _GCV_LOCK:
+            if not _GCV_CLIENTS:
+                try:
+                    from google.cloud import vision
+                    clients = [vision.ImageAnnotatorClient() for _ in range(max(1, GCV_CLIENT_POOL))]
+                except Exception as e:
+                    raise RuntimeError(f"Failed to initialize Google Cloud Vision: {e}")
+                _GCV_CLIENTS.extend(clients)
+    return _GCV_CLIENTS[next(_GCV_NEXT) % len(_GCV_CLIENTS)]
+
+
+def gcv_extract_text(img: Image.Image, lang: str = "en", max_side: int | None = None) -> str:
+    """
+    Extract text using Google Cloud Vision
+    Returns: plain text string
+    """
     try:
-        from google.cloud import vision
-        _GCV_CLIENT = vision.ImageAnnotatorClient()
-        return _GCV_CLIENT
+        # Convert PIL Image to bytes
+        return gcv_extract_text_bytes(encode_for_vision(img, max_side), lang)
     except Exception as e:
-        raise RuntimeError(f"Failed to initialize Google Cloud Vision: {e}")
+        logger.error(f"Google Vision OCR failed: {e}")
+        return ""
 
 
-def gcv_extract_text(img: Image.Image, lang: str = "en") -> str:
+def gcv_extract_text_bytes(content: bytes, lang: str = "en") -> str:
     """
-    Extract text using Google Cloud Vision
+    Extract text from encoded image bytes (PNG/JPEG/...) using Google Cloud Vision
     Returns: plain text string
     """
     try:
         client = _ensure_gcv_client()
         
-        # Convert PIL Image to bytes
-        buf = io.BytesIO()
-        img.save(buf, format='PNG')
-        content = buf.getvalue()
-        
         # Create Vision API image
         from google.cloud import vision
         image = vision.Image(content=content)
         
         # Detect text
-        response = client.text_detection(image=image)
+        with _GCV_INFLIGHT:
+            response = client.text_detection(image=image, retry=_gcv_retry())
         
         if response.error.message:
             raise Exception(response.error.message)
@@ -58,11 +109,231 @@ def gcv_extract_text(img: Image.Image, lang: str = "en") -> str:
         return ""
 
 
+# Vision accepts at most 16 images per batch_annotate_images call
+GCV_BATCH_SIZE = 16
+GCV_BATCH_MAX_BYTES = 30 * 1024 * 1024  # stay under the API's request size limit
+
+
+def encode_for_vision(img: Image.Image, max_side: int | None = None) -> bytes:
+    """
+    JPEG q92 without chroma subsampling: far faster and smaller than PNG, same OCR result
+    Binarized pages go out as 1-bit PNG instead (no JPEG ringing, a fraction of the bytes);
+    images:annotate does not take TIFF, only files:annotate does
+    max_side: downscale so the longer side is at most this many pixels (Vision gains nothing past ~2400)
+    """
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("L" if img.mode == "1" else "RGB")
+    # Two-level grayscale = a binarized page (getcolors returns None past 2 values)
+    binary = img.mode == "L" and img.getcolors(2) is not None
+    longest = max(img.size)
+    if max_side and longest > max_side:
+        img = img.resize(
+            (max(1, img.width * max_side // longest), max(1, img.height * max_side // longest)),
+            # Area averaging is enough for two-level pages and much cheaper than Lanczos
+            Image.BOX if binary else Image.LANCZOS,
+        )
+    buf = io.BytesIO()
+    if binary:
+        # Threshold at 128 (re-binarizes any resampled edges); 1-bit PNG deflates to a few KB
+        img.convert("1", dither=Image.Dither.NONE).save(buf, format='PNG')
+    else:
+        img.save(buf, format='JPEG', quality=92, optimize=False, subsampling=0)
+    return buf.getvalue()
+
+
+def gcv_extract_text_batch(imgs: list, lang: str = "en", max_side: int | None = None) -> list:
+    """
+    Extract text from several images with batched Google Cloud Vision calls
+    Returns: one plain text string per image, in input order ("" where OCR failed)
+    """
+    if not imgs:
+        return []
+
+    # libjpeg releases the GIL, so pages encode in parallel
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(imgs)))) as executor:
+        contents = list(executor.map(lambda img: encode_for_vision(img, max_side), imgs))
+    return gcv_extract_text_batch_bytes(contents, lang)
+
+
+def gcv_extract_text_batch_bytes(contents: list, lang: str = "en") -> list:
+    """
+    Batched Google Cloud Vision OCR over already-encoded image bytes
+    Returns: one plain text string per image, in input order ("" where OCR failed)
+    """
+    results = [""] * len(contents)
+    if not contents:
+        return results
+
+    # Group images into requests of <= GCV_BATCH_SIZE images / GCV_BATCH_MAX_BYTES
+    chunks, current, current_bytes = [], [], 0
+    for i, content in enumerate(contents):
+        if not content:  # page failed before OCR
+            continue
+        if current and (len(current) == GCV_BATCH_SIZE or current_bytes + len(content) > GCV_BATCH_MAX_BYTES):
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += len(content)
+    if current:
+        chunks.append(current)
+
+    try:
+        _ensure_gcv_client()
+        from google.cloud import vision
+        # Dense-text model for note pages; language hint from the OCR config
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        image_context = _image_context(lang)
+    except Exception as e:
+        logger.error(f"Google Vision OCR failed: {e}")
+        return results
+
+    def annotate(chunk):
+        try:
+            requests = [
+                vision.AnnotateImageRequest(
+                    image=vision.Image(content=contents[i]),
+                    features=[feature],
+                    image_context=image_context,
+                )
+                for i in chunk
+            ]
+            # Each chunk takes the next pooled client, so chunks run on separate channels
+            with _GCV_INFLIGHT:
+                batch = _ensure_gcv_client().batch_annotate_images(requests=requests, retry=_gcv_retry())
+            for i, response in zip(chunk, batch.responses):
+                if response.error.message:
+                    logger.error(f"Google Vision OCR failed on image {i}: {response.error.message}")
+                elif response.full_text_annotation.text:
+                    results[i] = response.full_text_annotation.text
+                elif response.text_annotations:
+                    results[i] = response.text_annotations[0].description
+        except Exception as e:
+            logger.error(f"Google Vision batch OCR failed: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(GCV_CLIENT_POOL, len(chunks)))) as executor:
+        list(executor.map(annotate, chunks))
+
+    return results
+
+
+# ========== VISION ASYNC PDF OCR ==========
+# Large PDFs can go to Vision whole via GCS; unset bucket = always OCR locally
+GCV_ASYNC_BUCKET = os.getenv("GCV_ASYNC_BUCKET")
+GCV_ASYNC_TIMEOUT = int(os.getenv("GCV_ASYNC_TIMEOUT", 600))
+GCV_ASYNC_PAGES_PER_SHARD = 20  # pages per output JSON file
+
+
+def gcv_extract_pdf_async(pdf_bytes: bytes, lang: str = "en", bucket_name: str | None = None) -> list | None:
+    """
+    OCR a whole PDF with one async_batch_annotate_files operation (Vision rasterizes server-side)
+    Returns: one plain text string per page, or None if the async path is unavailable/failed
+    """
+    bucket_name = bucket_name or GCV_ASYNC_BUCKET
+    if not bucket_name:
+        return None
+
+    prefix = f"ocr-async/{uuid.uuid4().hex}"
+    bucket = None
+    try:
+        from google.cloud import storage, vision
+
+        bucket = storage.Client().bucket(bucket_name)
+        bucket.blob(f"{prefix}/input.pdf").upload_from_string(pdf_bytes, content_type="application/pdf")
+
+        request = vision.AsyncAnnotateFileRequest(
+            features=[vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)],
+            input_config=vision.InputConfig(
+                gcs_source=vision.GcsSource(uri=f"gs://{bucket_name}/{prefix}/input.pdf"),
+                mime_type="application/pdf",
+            ),
+            output_config=vision.OutputConfig(
+                gcs_destination=vision.GcsDestination(uri=f"gs://{bucket_name}/{prefix}/out/"),
+                batch_size=GCV_ASYNC_PAGES_PER_SHARD,
+            ),
+            image_context=_image_context(lang),
+        )
+        operation = _ensure_gcv_client().async_batch_annotate_files(requests=[request])
+        operation.result(timeout=GCV_ASYNC_TIMEOUT)
+
+        # Output shards are AnnotateFileResponse JSON; pages carry their number in context
+        pages = {}
+        for blob in bucket.list_blobs(prefix=f"{prefix}/out/"):
+            shard = json.loads(blob.download_as_bytes())
+            for response in shard.get("responses", []):
+                number = response.get("context", {}).get("pageNumber")
+                if number:
+                    pages[number] = response.get("fullTextAnnotation", {}).get("text", "")
+
+        logger.info(f"Vision async OCR returned {len(pages)} pages")
+        return [pages.get(i, "") for i in range(1, max(pages, default=0) + 1)]
+
+    except Exception as e:
+        logger.error(f"Vision async PDF OCR failed, falling back to local pages: {e}")
+        return None
+    finally:
+        if bucket is not None:
+            try:
+                for blob in bucket.list_blobs(prefix=prefix):
+                    blob.delete()
+            except Exception as e:
+                logger.warning(f"Could not clean up gs://{bucket_name}/{prefix}: {e}")
+
+
+# ========== TESSERACT ==========
+# PyTessBaseAPI is not thread-safe, so engines are checked out of a small per-language pool;
+# request threads come and go, the engines (and their loaded models) stay
+TESS_POOL_SIZE = int(os.getenv("TESS_POOL_SIZE", 4))
+_TESS_POOLS: dict = {}  # lang -> queue of idle engines (None = not created yet), or None without tesserocr
+_TESS_LOCK = threading.Lock()
+
+def _tess_pool(lang: str):
+    with _TESS_LOCK:
+        if lang not in _TESS_POOLS:
+            try:
+                from tesserocr import PyTessBaseAPI
+                api = PyTessBaseAPI(lang=lang)  # fail here, once, if the language is missing
+                pool = queue.LifoQueue()  # LIFO: reuse the warmest engine before creating more
+                for _ in range(max(1, TESS_POOL_SIZE) - 1):
+                    pool.put(None)
+                pool.put(api)
+                _TESS_POOLS[lang] = pool
+            except Exception as e:
+                logger.debug(f"tesserocr unavailable for '{lang}' ({e}), using pytesseract")
+                _TESS_POOLS[lang] = None
+        return _TESS_POOLS[lang]
+
+@contextmanager
+def _tesserocr_api(lang: str):
+    """Borrow an in-process Tesseract engine for lang (None without tesserocr); blocks while all are busy"""
+    pool = _tess_pool(lang)
+    if pool is None:
+        yield None
+        return
+    api = pool.get()
+    try:
+        if api is None:
+            from tesserocr import PyTessBaseAPI
+            api = PyTessBaseAPI(lang=lang)
+        yield api
+    finally:
+        pool.put(api)
+
+
 def tesseract_extract_text(img: Image.Image, lang: str = "en") -> str:
     """
     Extract text using Tesseract (fallback)
+    Uses the linked libtesseract via tesserocr when installed (no subprocess per page)
     Returns: plain text string
     """
+    with _tesserocr_api(lang) as api:
+        if api is not None:
+            try:
+                api.SetImage(img)
+                return api.GetUTF8Text()
+            except Exception as e:
+                logger.error(f"Tesseract OCR failed: {e}")
+                return ""
+
     try:
         import pytesseract
         
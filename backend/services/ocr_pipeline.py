@@ -1,13 +1,27 @@
 # services/ocr_pipeline.py
 from __future__ import annotations
+import io
+import itertools
 import logging
+import os
+import queue
 import re
+import threading
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Iterator
 from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# Pages OCR'd at once per PDF (Vision RPCs / Tesseract subprocesses release the GIL)
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", 4))
+# Tesseract PDFs: render + OCR pages in a shared pool of this many processes (PyMuPDF rendering
+# holds the GIL); opt-in, the default of 1 keeps everything on the request threads
+OCR_PROCESSES = int(os.getenv("OCR_PROCESSES", 1))
+PAGE_QUEUE_SIZE = 4  # rendered pages waiting for a worker
+
 # ========== OCR CONFIGURATION ==========
 @dataclass
 class OCRConfig:
@@ -17,39 +31,290 @@ class OCRConfig:
     dpi: int = 400
     deskew: bool = True
     denoise: bool = True
+    denoise_mode: str = "median"  # "median" | "auto" | "nlmeans" | "bilateral" | "none"
     binarize: bool = True
     morph: bool = True
+    max_side: int = 2400  # longest side sent to Vision; 0 disables downscaling
+    renderer: str = "fitz"  # PDF rasterizer: "fitz" (PyMuPDF, in-process) or "poppler"
+    async_threshold_pages: int = 20  # gcv: PDFs this long go to Vision whole (needs GCV_ASYNC_BUCKET)
+    strip_headers_footers: bool = False  # drop lines repeated at the top/bottom of most PDF pages
+
+
+# ========== UPLOAD SNIFFING ==========
+SNIFF_BYTES = 1024  # PDF headers may sit anywhere in the first KB
+
+_MAGIC_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+)
+
+
+def sniff_file_kind(head: bytes) -> str | None:
+    """
+    Identify an upload from its leading bytes
+    Returns: "pdf" | "png" | "jpg" | "tiff" | "gif" | "bmp" | "webp", or None if unsupported
+    """
+    for signature, kind in _MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if b"%PDF-" in head[:SNIFF_BYTES]:
+        return "pdf"
+    return None
 
 
 # ========== MAIN OCR FUNCTION ==========
-def extract_text_smart(file_path: str, config: OCRConfig) -> str:
+def extract_text_smart(file_path: str, config: OCRConfig, kind: str | None = None) -> str:
     """
-    Extract text from image or PDF
+    Extract text from image or PDF on disk
+    kind: sniff_file_kind() result when the caller already has it
     Returns: plain text string
     """
     file_path = Path(file_path)
-    suffix = file_path.suffix.lower()
+    try:
+        data = file_path.read_bytes()
+    except OSError as e:
+        logger.error(f"Cannot read {file_path}: {e}")
+        return ""
+    return extract_text_from_bytes(data, file_path.name, config, kind)
+
+
+def extract_text_from_bytes(data: bytes, filename: str, config: OCRConfig, kind: str | None = None) -> str:
+    """
+    Extract text from an in-memory image or PDF
+    kind: sniff_file_kind() result; sniffed from data when omitted (the filename is only for logs)
+    Re-uploads of the same bytes with the same config are served from the OCR cache
+    Returns: plain text string
+    """
+    from services.cache import content_key, get_cache, get_json, set_json
+
+    cache_key = content_key("ocr", repr(config), data)
+    ocr_cache = get_cache("ocr")
+    cached = get_json(ocr_cache, cache_key)
+    if cached is not None:
+        logger.info(f"OCR served from cache: {filename}")
+        return cached
+
+    text = _extract_text_uncached(data, filename, config, kind or sniff_file_kind(data[:SNIFF_BYTES]))
+    if text and text.strip():
+        set_json(ocr_cache, cache_key, text)
+    return text
+
+
+def _run_page_pipeline(pages: Iterator[Image.Image], work: Callable[[Image.Image], Any]) -> list:
+    """
+    Producer-consumer over lazily rendered pages
+    One thread renders into a bounded queue while OCR_CONCURRENCY workers apply work(page),
+    so at most PAGE_QUEUE_SIZE rendered bitmaps wait in memory
+    Returns: work results in page order
+    """
+    q: queue.Queue = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    results: dict = {}
+    errors: list = []
+    workers = max(1, OCR_CONCURRENCY)
+    done = object()
+
+    def produce():
+        try:
+            for index, page in enumerate(pages):
+                q.put((index, page))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(workers):
+                q.put(done)
+
+    def consume():
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            index, page = item
+            try:
+                results[index] = work(page)
+            except Exception as e:
+                logger.error(f"Page {index + 1} failed: {e}")
+                results[index] = None
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
+    return [results[i] for i in range(len(results))]
+
+
+# ========== PROCESS-PARALLEL PDF OCR ==========
+_PROCESS_POOL = None  # one fixed-size pool shared by every request thread
+_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def _init_pdf_worker() -> None:
+    # One Tesseract / OpenCV thread per process, otherwise N processes x N threads oversubscribe
+    # the CPU (set before the first page imports src.ocr.preprocess, which reads OPENCV_THREADS)
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    os.environ["OPENCV_THREADS"] = "1"
+
+
+def _get_process_pool():
+    """Lazily start the shared pool; spawned, since forking a multithreaded server is unsafe"""
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        with _PROCESS_POOL_LOCK:
+            if _PROCESS_POOL is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                _PROCESS_POOL = ProcessPoolExecutor(
+                    max_workers=OCR_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_pdf_worker,
+                )
+    return _PROCESS_POOL
+
+
+def _reset_process_pool(pool) -> None:
+    """Drop a broken pool so the next PDF starts a fresh one"""
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is pool:
+            _PROCESS_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_ocr_pages(task: tuple) -> list:
+    """Render + OCR a contiguous page range, opening the PDF once for the whole range"""
+    import fitz
+    from src.utils.pdf_utils import render_fitz_page
+
+    data, start, stop, config = task
+    preprocess = config.deskew or config.denoise or config.binarize
+    texts = []
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for index in range(start, stop):
+            try:
+                img = render_fitz_page(fitz, doc[index], config.dpi, grayscale=preprocess)
+                texts.append(extract_text_from_image(img, config))
+            except Exception as e:
+                logger.error(f"Page {index + 1} failed: {e}")
+                texts.append(None)
+    return texts
+
+
+def _render_and_ocr_pdf(data: bytes, config: OCRConfig) -> list | None:
+    """
+    Render and OCR a PDF's pages in the shared process pool, one page range per worker
+    Returns: page texts, or None when the thread pipeline should be used instead
+    """
+    if OCR_PROCESSES <= 1 or config.renderer != "fitz":
+        return None
+    try:
+        from src.utils.pdf_utils import pdf_page_count
+        n_pages = pdf_page_count(data)
+    except Exception as e:
+        logger.warning(f"Could not count PDF pages: {e}")
+        return None
+    if n_pages < 2:
+        return None
+
+    workers = min(OCR_PROCESSES, n_pages)
+    bounds = [n_pages * k // workers for k in range(workers + 1)]
+    tasks = [(data, start, stop, config) for start, stop in zip(bounds, bounds[1:])]
+    logger.info(f"OCRing {n_pages} PDF pages in {workers} processes")
+    pool = _get_process_pool()
+    try:
+        return [text for chunk in pool.map(_render_ocr_pages, tasks) for text in chunk]
+    except Exception as e:
+        from concurrent.futures.process import BrokenProcessPool
+        if isinstance(e, BrokenProcessPool):
+            _reset_process_pool(pool)
+        logger.warning(f"Process pool OCR failed ({e}), falling back to threads")
+        return None
+
+
+def _postprocess_pages(texts: list, config: OCRConfig) -> list:
+    if config.strip_headers_footers:
+        texts = strip_headers_footers_by_frequency(texts)
+    return texts
+
+
+def _join_pages(texts: list) -> str:
+    result = "\n\n".join(
+        f"--- Page {i} ---\n{text}"
+        for i, text in enumerate(texts, 1)
+        if text and text.strip()
+    )
+    logger.info(f"Extracted {len(result)} chars from {len(texts)} pages")
+    return result
+
+
+def _maybe_async_pdf_ocr(data: bytes, config: OCRConfig) -> list | None:
+    """Whole-PDF Vision OCR for long documents when a GCS bucket is configured"""
+    from services.ocr import GCV_ASYNC_BUCKET, gcv_extract_pdf_async
+    from src.utils.pdf_utils import pdf_page_count
+
+    if not GCV_ASYNC_BUCKET or config.async_threshold_pages <= 0:
+        return None
+    try:
+        pages = pdf_page_count(data)
+    except Exception as e:
+        logger.warning(f"Could not count PDF pages: {e}")
+        return None
+    if pages < config.async_threshold_pages:
+        return None
+
+    logger.info(f"PDF has {pages} pages, using Vision async file OCR")
+    return gcv_extract_pdf_async(data, config.lang)
+
+
+def _extract_text_uncached(data: bytes, filename: str, config: OCRConfig, kind: str | None) -> str:
+    # Route on the content, not the name: a renamed PDF is still a PDF
+    if kind is None:
+        kind = "pdf" if Path(filename).suffix.lower() == ".pdf" else None
     
     # Handle PDFs
-    if suffix == ".pdf":
+    if kind == "pdf":
         try:
-            # Import pdf_to_images function
-            from src.utils.pdf_utils import pdf_to_images
+            from src.utils.pdf_utils import iter_pdf_bytes_pages
             
-            logger.info(f"Converting PDF to images: {file_path.name}")
-            images = pdf_to_images(str(file_path), dpi=config.dpi)
-            logger.info(f"PDF has {len(images)} pages")
+            if config.engine == "gcv":
+                texts = _maybe_async_pdf_ocr(data, config)
+                if texts is not None:
+                    return _join_pages(_postprocess_pages(texts, config))
             
-            all_text = []
-            for i, img in enumerate(images, 1):
-                logger.info(f"Processing page {i}/{len(images)}")
-                text = extract_text_from_image(img, config)
-                if text and text.strip():
-                    all_text.append(f"--- Page {i} ---\n{text}")
+            if config.engine != "gcv":
+                texts = _render_and_ocr_pdf(data, config)
+                if texts is not None:
+                    return _join_pages(_postprocess_pages(texts, config))
             
-            result = "\n\n".join(all_text)
-            logger.info(f"Extracted {len(result)} chars from {len(images)} pages")
-            return result
+            logger.info(f"Rendering and OCRing PDF pages: {filename}")
+            # Preprocessing works on grayscale anyway, so skip rendering color channels
+            preprocess = config.deskew or config.denoise or config.binarize
+            pages = iter_pdf_bytes_pages(
+                data, dpi=config.dpi, renderer=config.renderer, grayscale=preprocess
+            )
+            
+            if config.engine == "gcv":
+                # Workers preprocess + JPEG-encode pages as they render; then batched Vision requests
+                from services.ocr import encode_for_vision, gcv_extract_text_batch_bytes
+                contents = _run_page_pipeline(
+                    pages, lambda img: encode_for_vision(preprocess_image(img, config), config.max_side)
+                )
+                texts = gcv_extract_text_batch_bytes(contents, config.lang)
+            else:
+                texts = _run_page_pipeline(pages, lambda img: extract_text_from_image(img, config))
+            logger.info(f"PDF has {len(texts)} pages")
+
+            return _join_pages(_postprocess_pages(texts, config))
             
         except ImportError as e:
             logger.error(f"PDF library not available: {e}")
@@ -61,34 +326,48 @@ def extract_text_smart(file_path: str, config: OCRConfig) -> str:
     # Handle images
     else:
         try:
-            img = Image.open(file_path)
+            # Nothing to preprocess: hand the upload bytes to Vision untouched
+            # (except TIFF, which images:annotate does not accept; it is re-encoded below)
+            if config.engine == "gcv" and kind != "tiff" and not (config.deskew or config.denoise or config.binarize):
+                from services.ocr import gcv_extract_text_bytes
+                return gcv_extract_text_bytes(data, config.lang) or ""
+
+            img = Image.open(io.BytesIO(data))
             return extract_text_from_image(img, config)
         except Exception as e:
             logger.error(f"Image processing failed: {e}")
             return ""
 
 
+def preprocess_image(img: Image.Image, config: OCRConfig) -> Image.Image:
+    """Apply the configured preprocessing steps (deskew/denoise/binarize/morph)"""
+    if config.deskew or config.denoise or config.binarize:
+        try:
+            from src.ocr.preprocess import preprocess_for_ocr
+            img = preprocess_for_ocr(
+                img,
+                deskew=config.deskew,
+                denoise=config.denoise,
+                binarize=config.binarize,
+                morph=config.morph,
+                denoise_mode=config.denoise_mode
+            )
+        except ImportError:
+            logger.warning("Preprocessing not available, using raw image")
+        except Exception as e:
+            logger.warning(f"Preprocessing failed ({e}), using raw image")
+    return img
+
+
 def extract_text_from_image(img: Image.Image, config: OCRConfig) -> str:
     """Extract text from a single image using OCR"""
     try:
-        # Preprocess if needed
-        if config.deskew or config.denoise or config.binarize:
-            try:
-                from src.ocr.preprocess import preprocess_for_ocr
-                img = preprocess_for_ocr(
-                    img,
-                    deskew=config.deskew,
-                    denoise=config.denoise,
-                    binarize=config.binarize,
-                    morph=config.morph
-                )
-            except ImportError:
-                logger.warning("Preprocessing not available, using raw image")
+        img = preprocess_image(img, config)
         
         # Use Google Cloud Vision
         if config.engine == "gcv":
             from services.ocr import gcv_extract_text
-            text = gcv_extract_text(img, config.lang)
+            text = gcv_extract_text(img, config.lang, config.max_side)
         else:
             from services.ocr import tesseract_extract_text
             text = tesseract_extract_text(img, config.lang)
@@ -101,15 +380,63 @@ def extract_text_from_image(img: Image.Image, config: OCRConfig) -> str:
 
 
 # ========== HELPER FUNCTIONS ==========
+_RE_SPACES = re.compile(r' +')
+_RE_NEWLINES = re.compile(r'\n{3,}')
+_RE_LINE_EDGES = re.compile(r'[^\S\n]*\n[^\S\n]*')  # whitespace around newlines, as str.strip() sees it
+# "hyph-\nenated": only when the next line starts with a lowercase letter, so "well-\n known"
+# and "Jean-\nPaul" keep their hyphen
+_RE_HYPHEN_BREAK = re.compile(r'(?<=\w)-[ ]*\n(?=[a-z])')
+
+
+# ========== HEADERS / FOOTERS ==========
+EDGE_LINES = 3  # headers/footers only live in the first/last few lines of a page
+
+
+def strip_headers_footers_by_frequency(page_texts: list, min_ratio: float = 0.6) -> list:
+    """Drop page-edge lines that repeat on at least min_ratio of the pages (running headers, footers)"""
+    if len(page_texts) < 3:
+        return page_texts
+
+    lines_by_page = [[ln.strip() for ln in (p or "").splitlines()] for p in page_texts]
+
+    # Count each edge line once per page; on pages of 2*EDGE_LINES lines or fewer
+    # every line is an edge line, so they are body text and never candidates
+    counts = Counter(itertools.chain.from_iterable(
+        {ln for ln in lines[:EDGE_LINES] + lines[-EDGE_LINES:] if ln}
+        for lines in lines_by_page
+        if len(lines) > 2 * EDGE_LINES
+    ))
+    threshold = max(2, int(len(page_texts) * min_ratio))
+    common = frozenset(ln for ln, n in counts.items() if n >= threshold)
+    if not common:
+        return page_texts
+
+    out = []
+    for page, lines in zip(page_texts, lines_by_page):
+        if len(lines) <= 2 * EDGE_LINES:
+            out.append(page)
+            continue
+        last = len(lines) - EDGE_LINES
+        out.append("\n".join(
+            ln for i, ln in enumerate(lines)
+            if not (ln in common and (i < EDGE_LINES or i >= last))
+        ))
+    logger.info(f"Stripped {len(common)} repeated header/footer lines")
+    return out
+
+
 def top_concepts(text: str, top_n: int = 10) -> list[dict]:
     """Extract top concepts from text"""
     try:
-        from src.nlp.extract import get_nlp, extract_keyphrases
+        from src.nlp.extract import KEYPHRASE_DISABLED_PIPES, get_nlp, extract_keyphrases, parse_cached
+        from services.cache import get_cache
         
-        nlp = get_nlp()
-        doc = nlp(text[:50000])
-        keyphrases = extract_keyphrases(doc, top_n=top_n)
-        return keyphrases
+        nlp = get_nlp()  # cached, loaded once per process
+        doc = parse_cached(nlp, text[:50000], get_cache("nlp"), disable=KEYPHRASE_DISABLED_PIPES)
+        return [
+            {"phrase": phrase, "score": score}
+            for phrase, score in extract_keyphrases(doc, top_k=top_n)
+        ]
         
     except Exception as e:
         logger.error(f"Concept extraction failed: {e}")
@@ -121,10 +448,10 @@ def cleanup_text(text: str) -> str:
     if not text:
         return ""
     
-    text = re.sub(r' +', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
+    text = _RE_SPACES.sub(' ', text)
+    text = _RE_HYPHEN_BREAK.sub('', text)
+    text = _RE_NEWLINES.sub('\n\n', text)
+    text = _RE_LINE_EDGES.sub('\n', text)  # strip every line in one pass
     text = text.strip()
     
     return text
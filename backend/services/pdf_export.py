@@ -13,6 +13,108 @@ from reportlab.pdfgen import canvas
 logger = logging.getLogger(__name__)
 
 
+# ========== STYLES ==========
+# Built once at import; styles are read-only during layout, so every export shares them
+_STYLES = getSampleStyleSheet()
+
+# Custom styles
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=28,
+    textColor=colors.HexColor('#5A8A7A'),
+    spaceAfter=12,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold',
+)
+
+_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#3A6768'),
+    spaceAfter=12,
+    spaceBefore=12,
+    fontName='Helvetica-Bold',
+    borderColor=colors.HexColor('#5A8A7A'),
+    borderWidth=2,
+    borderPadding=10,
+)
+
+_NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_STYLES['Normal'],
+    fontSize=11,
+    alignment=TA_JUSTIFY,
+    spaceAfter=10,
+    leading=14,
+)
+
+_CONCEPT_STYLE = ParagraphStyle(
+    'ConceptText',
+    parent=_STYLES['Normal'],
+    fontSize=10,
+    alignment=TA_LEFT,
+    spaceAfter=6,
+    leading=12,
+)
+
+_TEXT_STYLE = ParagraphStyle(
+    'ExtractedText',
+    parent=_STYLES['Normal'],
+    fontSize=10,
+    alignment=TA_JUSTIFY,
+    spaceAfter=10,
+    leading=13,
+    textColor=colors.HexColor('#2B3A3A'),
+)
+
+_FOOTER_STYLE = ParagraphStyle('Footer', parent=_STYLES['Normal'], alignment=TA_CENTER)
+
+_CONCEPT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5A8A7A')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#FAF8F3')),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#3A6768')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAF8F3')]),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('LEFTPADDING', (0, 0), (-1, -1), 10),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+_NODE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5A8A7A')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#FAF8F3')),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#3A6768')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAF8F3')]),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+# Relevance bars for scores 0.0..1.0 in tenths
+_BARS = ["█" * i + "░" * (10 - i) for i in range(11)]
+
+
+def _density(n_nodes: int, n_edges: int) -> float:
+    """Edges over the n*(n-1)/2 possible undirected connections"""
+    return n_edges / (n_nodes * (n_nodes - 1) / 2) if n_nodes > 1 else 0.0
+
+
 class MindmapPDFExporter:
     """Export mindmap results to professional PDF"""
     
@@ -46,53 +148,10 @@ class MindmapPDFExporter:
             
             # Story to hold all elements
             story = []
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=28,
-                textColor=colors.HexColor('#5A8A7A'),
-                spaceAfter=12,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                textColor=colors.HexColor('#3A6768'),
-                spaceAfter=12,
-                spaceBefore=12,
-                fontName='Helvetica-Bold',
-                borderColor=colors.HexColor('#5A8A7A'),
-                borderWidth=2,
-                borderPadding=10,
-            )
-            
-            normal_style = ParagraphStyle(
-                'CustomNormal',
-                parent=styles['Normal'],
-                fontSize=11,
-                alignment=TA_JUSTIFY,
-                spaceAfter=10,
-                leading=14,
-            )
-            
-            concept_style = ParagraphStyle(
-                'ConceptText',
-                parent=styles['Normal'],
-                fontSize=10,
-                alignment=TA_LEFT,
-                spaceAfter=6,
-                leading=12,
-            )
             
             # ========== TITLE PAGE ==========
             story.append(Spacer(1, 0.5*inch))
-            story.append(Paragraph("📊 AI Notes Mindmap", title_style))
+            story.append(Paragraph("📊 AI Notes Mindmap", _TITLE_STYLE))
             story.append(Spacer(1, 0.3*inch))
             
             # Metadata
@@ -106,20 +165,20 @@ class MindmapPDFExporter:
             Concepts Found: {meta.get('concept_count', 0)}<br/>
             </font>
             """
-            story.append(Paragraph(subtitle_text, normal_style))
+            story.append(Paragraph(subtitle_text, _NORMAL_STYLE))
             story.append(Spacer(1, 0.3*inch))
             
             # Summary
             summary = data.get('summary', '')
             if summary:
-                story.append(Paragraph("<b>Summary</b>", heading_style))
-                story.append(Paragraph(summary, normal_style))
+                story.append(Paragraph("<b>Summary</b>", _HEADING_STYLE))
+                story.append(Paragraph(summary, _NORMAL_STYLE))
                 story.append(Spacer(1, 0.2*inch))
             
             story.append(PageBreak())
             
             # ========== SECTION 1: KEY CONCEPTS ==========
-            story.append(Paragraph("🔑 Key Concepts", heading_style))
+            story.append(Paragraph("🔑 Key Concepts", _HEADING_STYLE))
             story.append(Spacer(1, 0.15*inch))
             
             keyphrases = data.get('keyphrases', [])
@@ -130,31 +189,14 @@ class MindmapPDFExporter:
                 for idx, kp in enumerate(keyphrases, 1):
                     phrase = kp.get('phrase', 'Unknown')
                     score = kp.get('score', 0.5)
-                    relevance_bar = "█" * int(score * 10) + "░" * (10 - int(score * 10))
                     concept_data.append([
                         str(idx),
                         phrase,
-                        f"{relevance_bar} {int(score*100)}%"
+                        f"{_BARS[min(max(int(score * 10), 0), 10)]} {int(score*100)}%"
                     ])
                 
                 concept_table = Table(concept_data, colWidths=[0.5*inch, 3*inch, 1.5*inch])
-                concept_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5A8A7A')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#FAF8F3')),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#3A6768')),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAF8F3')]),
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 1), (-1, -1), 10),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 10),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-                    ('TOPPADDING', (0, 0), (-1, -1), 8),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ]))
+                concept_table.setStyle(_CONCEPT_TABLE_STYLE)
                 
                 story.append(concept_table)
                 story.append(Spacer(1, 0.3*inch))
@@ -162,28 +204,31 @@ class MindmapPDFExporter:
             story.append(PageBreak())
             
             # ========== SECTION 2: MINDMAP STRUCTURE ==========
-            story.append(Paragraph("🧠 Mindmap Structure", heading_style))
+            story.append(Paragraph("🧠 Mindmap Structure", _HEADING_STYLE))
             story.append(Spacer(1, 0.15*inch))
             
             mindmap = data.get('mindmap', {})
             nodes = mindmap.get('nodes', [])
             edges = mindmap.get('edges', [])
             
+            n_nodes = len(nodes)
+            n_edges = len(edges)
+            
             if nodes:
                 # Mindmap statistics
                 stats_text = f"""
                 <font size=11>
                 <b>Graph Statistics:</b><br/>
-                • Total Nodes: {len(nodes)}<br/>
-                • Total Connections: {len(edges)}<br/>
-                • Network Density: {self._calculate_density(nodes, edges):.2%}<br/>
+                • Total Nodes: {n_nodes}<br/>
+                • Total Connections: {n_edges}<br/>
+                • Network Density: {_density(n_nodes, n_edges):.2%}<br/>
                 </font>
                 """
-                story.append(Paragraph(stats_text, normal_style))
+                story.append(Paragraph(stats_text, _NORMAL_STYLE))
                 story.append(Spacer(1, 0.2*inch))
                 
                 # Node listing
-                story.append(Paragraph("<b>Nodes in Mindmap:</b>", normal_style))
+                story.append(Paragraph("<b>Nodes in Mindmap:</b>", _NORMAL_STYLE))
                 story.append(Spacer(1, 0.1*inch))
                 
                 node_data = [["ID", "Node Label"]]
@@ -193,26 +238,11 @@ class MindmapPDFExporter:
                         node.get('label', 'Unknown')[:60]
                     ])
                 
-                if len(nodes) > 30:
-                    node_data.append(["...", f"... and {len(nodes) - 30} more nodes"])
+                if n_nodes > 30:
+                    node_data.append(["...", f"... and {n_nodes - 30} more nodes"])
                 
                 node_table = Table(node_data, colWidths=[0.8*inch, 4.5*inch])
-                node_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5A8A7A')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#FAF8F3')),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#3A6768')),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAF8F3')]),
-                    ('FONTSIZE', (0, 1), (-1, -1), 9),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                    ('TOPPADDING', (0, 0), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ]))
+                node_table.setStyle(_NODE_TABLE_STYLE)
                 
                 story.append(node_table)
                 story.append(Spacer(1, 0.3*inch))
@@ -220,7 +250,7 @@ class MindmapPDFExporter:
             story.append(PageBreak())
             
             # ========== SECTION 3: EXTRACTED TEXT ==========
-            story.append(Paragraph("📄 Extracted Text", heading_style))
+            story.append(Paragraph("📄 Extracted Text", _HEADING_STYLE))
             story.append(Spacer(1, 0.15*inch))
             
             text = data.get('text', '')
@@ -230,24 +260,14 @@ class MindmapPDFExporter:
                 if len(text) > 2000:
                     display_text += "\n\n[... text truncated for PDF size ...]"
                 
-                text_style = ParagraphStyle(
-                    'ExtractedText',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    alignment=TA_JUSTIFY,
-                    spaceAfter=10,
-                    leading=13,
-                    textColor=colors.HexColor('#2B3A3A'),
-                )
-                
-                story.append(Paragraph(display_text, text_style))
+                story.append(Paragraph(display_text, _TEXT_STYLE))
             
             story.append(Spacer(1, 0.5*inch))
             
             # ========== FOOTER ==========
             story.append(Paragraph(
                 f"<font size=9 color='#6B7B7B'>Report generated by AI Notes Mindmap • {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</font>",
-                ParagraphStyle('Footer', parent=styles['Normal'], alignment=TA_CENTER)
+                _FOOTER_STYLE
             ))
             
             # Build PDF
@@ -260,14 +280,6 @@ class MindmapPDFExporter:
         except Exception as e:
             logger.error(f"❌ PDF generation failed: {e}")
             raise
-    
-    def _calculate_density(self, nodes, edges):
-        """Calculate network density"""
-        if not nodes:
-            return 0
-        n = len(nodes)
-        max_edges = n * (n - 1) / 2
-        return len(edges) / max_edges if max_edges > 0 else 0
 
 
 def export_results_to_pdf(data: dict) -> bytes:
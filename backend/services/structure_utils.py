@@ -1,13 +1,17 @@
 # services/structure_utils.py
 from __future__ import annotations
+from functools import lru_cache
 from typing import List, Dict, Any
 
+# Pure string helpers hit with the same labels across every node/edge; memoized
+@lru_cache(maxsize=8192)
 def titleize(s: str) -> str:
     s = " ".join(s.split())
     if not s:
         return s
     return s if s.isupper() else s.title()
 
+@lru_cache(maxsize=8192)
 def normalize_key(s: str) -> str:
     return " ".join((s or "").strip().lower().split())
 
@@ -57,7 +61,7 @@ def bullets_to_graph(bullets: List[Dict[str, Any]]):
             id_map[key] = label
         return key
 
-    edges = []
+    edge_counts: dict[tuple[str, str], int] = {}  # counted while walking, no edge list
     roots = []
 
     def walk(node, parent_key=None, depth=0):
@@ -70,7 +74,8 @@ def bullets_to_graph(bullets: List[Dict[str, Any]]):
         if depth == 0:
             roots.append(key)
         if parent_key and key != parent_key:
-            edges.append((parent_key, key))
+            edge = (parent_key, key)
+            edge_counts[edge] = edge_counts.get(edge, 0) + 1
         for child in (node.get("children") or []):
             walk(child, key, depth+1)
 
@@ -78,9 +83,7 @@ def bullets_to_graph(bullets: List[Dict[str, Any]]):
         walk(top, None, 0)
 
     nodes = [{"id": k, "label": id_map[k]} for k in id_map.keys()]
-    from collections import Counter
-    cnt = Counter(edges)
-    vis_edges = [{"from": a, "to": b, "label": f"w={w}"} for (a, b), w in cnt.items()]
+    vis_edges = [{"from": a, "to": b, "label": f"w={w}"} for (a, b), w in edge_counts.items()]
     root = roots[0] if roots else (nodes[0]["id"] if nodes else None)
     return {"root": id_map.get(root, root), "nodes": nodes, "edges": vis_edges}
 
@@ -98,7 +101,7 @@ def relations_to_graph(relations: List[List[str]] | None):
         if key and key not in id_map:
             id_map[key] = label
         return key
-    edges = []
+    edge_counts: dict[tuple[str, str], int] = {}
     for pair in relations:
         if not isinstance(pair, (list, tuple)) or len(pair) < 2:
             continue
@@ -107,9 +110,7 @@ def relations_to_graph(relations: List[List[str]] | None):
             continue
         ak = get_id(a); bk = get_id(b)
         if ak and bk and ak != bk:
-            edges.append((ak, bk))
-    from collections import Counter
-    cnt = Counter(edges)
+            edge_counts[(ak, bk)] = edge_counts.get((ak, bk), 0) + 1
     nodes = [{"id": k, "label": v} for k, v in id_map.items()]
-    vis_edges = [{"from": a, "to": b, "label": f"w={w}"} for (a, b), w in cnt.items()]
+    vis_edges = [{"from": a, "to": b, "label": f"w={w}"} for (a, b), w in edge_counts.items()]
     return {"nodes": nodes, "edges": vis_edges}
\ No newline at end of file
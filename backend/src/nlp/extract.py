@@ -1,11 +1,28 @@
 import re
+import hashlib
+import heapq
 from collections import Counter
+from functools import lru_cache
 from typing import List, Tuple
 import spacy
+from spacy.tokens import Doc, DocBin
 
+# Components never read downstream (keyphrases use tagger/parser, SVO uses lemmas)
+_EXCLUDED_PIPES = ["ner", "textcat"]
+
+# Patterns used on every keyphrase/sentence call
+_RE_SPACES = re.compile(r"\s+")
+_RE_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9\s\-\:_/]")
+_RE_CAPITALIZED = re.compile(r"\b[A-Z][a-zA-Z0-9]+\b")
+_RE_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Keyphrase extraction reads noun_chunks/POS only; pass as disable= when parsing for it
+KEYPHRASE_DISABLED_PIPES = ("lemmatizer",)
+
+@lru_cache(maxsize=1)
 def get_nlp():
     try:
-        return spacy.load("en_core_web_sm")
+        return spacy.load("en_core_web_sm", exclude=_EXCLUDED_PIPES)
     except OSError:
         # Fallback: blank English with sentencizer only (reduced features)
         nlp = spacy.blank("en")
@@ -13,11 +30,82 @@ def get_nlp():
             nlp.add_pipe("sentencizer")
         return nlp
 
+def _active_disabled(nlp, disable) -> List[str]:
+    return [name for name in disable if name in nlp.pipe_names]
+
+def _doc_key(nlp, text: str, disable=()) -> str:
+    pipes = ",".join(p for p in nlp.pipe_names if p not in disable)
+    h = hashlib.sha256()
+    h.update(f"{nlp.meta.get('name')}-{nlp.meta.get('version')}-{pipes}".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return "doc:" + h.hexdigest()
+
+def _load_doc(nlp, cache, key: str):
+    try:
+        data = cache.get(key)
+        if data is not None:
+            return next(DocBin().from_bytes(data).get_docs(nlp.vocab))
+    except Exception:
+        pass
+    return None
+
+def _store_doc(cache, key: str, doc: Doc) -> None:
+    try:
+        cache.set(key, DocBin(docs=[doc]).to_bytes())
+    except Exception:
+        pass
+
+def parse_cached(nlp, text: str, cache=None, disable=()) -> Doc:
+    """
+    Parse text with nlp, reusing a serialized Doc (DocBin bytes) from cache
+    cache: any object with get(key)/set(key, value); None disables caching
+    disable: pipeline components to skip for this call (thread-safe, unlike select_pipes)
+    """
+    disable = _active_disabled(nlp, disable)
+    if cache is None:
+        return nlp(text, disable=disable)
+
+    key = _doc_key(nlp, text, disable)
+    doc = _load_doc(nlp, cache, key)
+    if doc is None:
+        doc = nlp(text, disable=disable)
+        _store_doc(cache, key, doc)
+    return doc
+
+def pipe_cached(nlp, texts: List[str], cache=None, n_process: int = 1, batch_size: int = 4, disable=()) -> List[Doc]:
+    """
+    Parse several texts in one nlp.pipe batch; cached Docs are reused as in parse_cached
+    Returns: Docs in the same order as texts
+    """
+    disable = _active_disabled(nlp, disable)
+    keys = [_doc_key(nlp, t, disable) for t in texts] if cache is not None else [None] * len(texts)
+    docs = [_load_doc(nlp, cache, k) if k else None for k in keys]
+
+    misses = [i for i, d in enumerate(docs) if d is None]
+    if misses:
+        n_process = max(1, min(n_process, len(misses)))
+        parsed = nlp.pipe(
+            (texts[i] for i in misses), n_process=n_process, batch_size=batch_size, disable=disable
+        )
+        for i, doc in zip(misses, parsed):
+            docs[i] = doc
+            if cache is not None:
+                _store_doc(cache, keys[i], doc)
+    return docs
+
 def normalize_space(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    return _RE_SPACES.sub(" ", text).strip()
+
+@lru_cache(maxsize=1)
+def get_sentencizer():
+    # Rule-based sentence boundaries only: no tagger/parser to run
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
 
-def split_sentences(text: str, nlp) -> List[str]:
-    doc = nlp(text)
+def split_sentences(text, nlp=None) -> List[str]:
+    # A parsed Doc keeps its parser boundaries; plain text goes through the sentencizer
+    doc = text if isinstance(text, Doc) else get_sentencizer()(text)
     return [normalize_space(s.text) for s in doc.sents if s.text.strip()]
 
 def _noun_chunks_or_tokens(doc):
@@ -38,45 +126,57 @@ def _noun_chunks_or_tokens(doc):
             chunks = tokens
     return chunks
 
-def extract_keyphrases(text: str, nlp, top_k: int = 15) -> List[Tuple[str, float]]:
-    cleaned = re.sub(r"[^A-Za-z0-9\s\-\:_/]", " ", text.lower())
-    cleaned = re.sub(r"\s+", " ", cleaned)
-    doc = nlp(cleaned)
+def extract_keyphrases(text, nlp=None, top_k: int = 15) -> List[Tuple[str, float]]:
+    if isinstance(text, Doc):
+        doc = text
+        text = doc.text
+    else:
+        cleaned = _RE_UNSAFE_CHARS.sub(" ", text.lower())
+        cleaned = _RE_SPACES.sub(" ", cleaned)
+        doc = nlp(cleaned)
 
     candidates = _noun_chunks_or_tokens(doc)
     if not candidates:
-        candidates = re.findall(r"\b[A-Z][a-zA-Z0-9]+\b", text)
+        candidates = _RE_CAPITALIZED.findall(text)
 
-    def norm(s): return re.sub(r"[^a-z0-9]+", " ", s.lower()).strip()
-    cand_norm = [norm(c) for c in candidates if len(c.strip()) > 1]
-    freq = Counter(cand_norm)
+    def norm(s): return _RE_NON_ALNUM.sub(" ", s.lower()).strip()
+    # Normalize each distinct candidate once, then fold the counts back in
+    raw_freq = Counter(c for c in candidates if len(c.strip()) > 1)
+    norm_of = {c: norm(c) for c in raw_freq}
+    freq = Counter()
+    for c, n in raw_freq.items():
+        freq[norm_of[c]] += n
 
     # Boost early-title candidates
     lines = [l.strip() for l in text.splitlines() if l.strip()]
     early = " ".join(lines[:3]).lower() if lines else ""
-    boosts = Counter({c: 2 for c in cand_norm if c in early})
+    boosts = Counter({c: 2 for c in freq if c in early})
 
-    scores = {c: freq[c] + boosts[c] + min(len(c.split()), 3) * 0.2 for c in freq}
-    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    # Lazy ranking: heapify is O(n) and dedup usually stops after ~top_k pops,
+    # instead of sorting every candidate; the index keeps ties in first-seen order
+    heap = [(-(freq[c] + boosts[c] + min(len(c.split()), 3) * 0.2), i, c) for i, c in enumerate(freq)]
+    heapq.heapify(heap)
 
     # Deduplicate: keep longest unique variants
+    # Kept phrases are [a-z0-9 ] only, so one "\x00"-joined blob answers
+    # "is phrase a substring of any kept phrase" in a single C-level scan
     dedup = []
-    seen = set()
-    for phrase, sc in ranked:
-        if phrase in seen: 
-            continue
-        if any(phrase in p for p, _ in dedup):
+    kept_blob = ""
+    while heap:
+        neg_sc, _, phrase = heapq.heappop(heap)
+        sc = -neg_sc
+        if phrase in kept_blob:
             continue
         dedup.append((phrase, sc))
-        seen.add(phrase)
+        kept_blob += "\x00" + phrase
         if len(dedup) >= top_k:
             break
 
     # Map normalized back to original
+    kept = dict(dedup)
     orig_map = {}
-    for c in candidates:
-        n = norm(c)
-        if n in dict(dedup) and (n not in orig_map or len(c) > len(orig_map[n])):
+    for c, n in norm_of.items():
+        if n in kept and (n not in orig_map or len(c) > len(orig_map[n])):
             orig_map[n] = c.strip()
 
     out = [(orig_map.get(p, p), float(sc)) for p, sc in dedup]
@@ -6,18 +6,19 @@ def build_hierarchy_tree(G_cooc: nx.Graph, root: str = None) -> nx.DiGraph:
     if root is None:
         root = sorted(G_cooc.degree, key=lambda x: x[1], reverse=True)[0][0]
 
-    # Connect isolated nodes to root with minimal weight
+    # Leave G_cooc untouched: hang each other component off root on the spanning
+    # forest itself (the same tree as adding those bridges to G_cooc first)
+    T_undirected = nx.maximum_spanning_tree(G_cooc, weight="weight")
+    reachable = nx.node_connected_component(G_cooc, root)
     for n in list(G_cooc.nodes()):
-        if n == root:
+        if n in reachable:
             continue
-        if not nx.has_path(G_cooc, root, n):
-            G_cooc.add_edge(root, n, weight=0.0001)
+        reachable |= nx.node_connected_component(G_cooc, n)
+        T_undirected.add_edge(root, n, weight=0.0001)
 
-    T_undirected = nx.maximum_spanning_tree(G_cooc, weight="weight")
+    # Everything is now one component, so a single BFS from root orients the whole tree
     T = nx.DiGraph()
     T.add_nodes_from(T_undirected.nodes(data=True))
-    for comp in nx.connected_components(T_undirected):
-        comp_root = root if root in comp else list(comp)[0]
-        for u, v in nx.bfs_edges(T_undirected, source=comp_root):
-            T.add_edge(u, v, weight=G_cooc[u][v].get("weight", 1))
-    return T
\ No newline at end of file
+    for u, v in nx.bfs_edges(T_undirected, source=root):
+        T.add_edge(u, v, weight=T_undirected[u][v].get("weight", 1))
+    return T
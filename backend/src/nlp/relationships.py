@@ -1,68 +1,198 @@
-from typing import List, Dict
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Dict, Set, Tuple
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from functools import lru_cache
 import itertools
 import re
-import networkx as nx
+import numpy as np
 
+if TYPE_CHECKING:
+    import networkx as nx
+
+try:
+    import ahocorasick
+except ImportError:  # optional: falls back to the token n-gram index
+    ahocorasick = None
+
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+# ASCII fast path: every non [a-z0-9] code point -> space in one C-level translate
+_NORMALIZE_KEEP = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+_NORMALIZE_TABLE = str.maketrans({chr(c): " " for c in range(128) if chr(c) not in _NORMALIZE_KEEP})
+
+@lru_cache(maxsize=4096)
 def _normalize(s: str) -> str:
-    return re.sub(r"[^a-z0-9]+", " ", s.lower()).strip()
+    # Memoized: keyphrases and repeated subtree fragments are normalized many times per document
+    s = s.lower()
+    if s.isascii():
+        return " ".join(s.translate(_NORMALIZE_TABLE).split())
+    return _NORMALIZE_RE.sub(" ", s).strip()
+
+def _postings_ngram(norm_sents: List[str], kp_norm: Dict[str, str]) -> Dict[str, Set[int]]:
+    gram_sizes = sorted({len(nk.split()) for nk in kp_norm})
+    posting: Dict[str, Set[int]] = defaultdict(set)
+    for sid, s in enumerate(norm_sents):
+        toks = s.split()
+        for n in gram_sizes:
+            for i in range(len(toks) - n + 1):
+                k = kp_norm.get(" ".join(toks[i:i + n]))
+                if k is not None:
+                    posting[k].add(sid)
+    return posting
+
+def _automaton(kp_norm: Dict[str, str]):
+    """Aho-Corasick automaton over normalized -> original keyphrases; callers build it once per call"""
+    A = ahocorasick.Automaton()
+    for nk, k in kp_norm.items():
+        A.add_word(nk, (len(nk), k))
+    A.make_automaton()
+    return A
+
+def _token_hits(A, text: str):
+    """(start offset, keyphrase) for automaton hits on whole tokens of normalized text, same as the n-gram index"""
+    for end, (n, k) in A.iter(text):
+        begin = end - n + 1
+        if begin > 0 and text[begin - 1] not in " \n":
+            continue
+        if end + 1 < len(text) and text[end + 1] not in " \n":
+            continue
+        yield begin, k
 
-def build_cooccurrence_graph(sentences: List[str], keyphrases: List[str]) -> nx.Graph:
+def _postings_automaton(norm_sents: List[str], kp_norm: Dict[str, str]) -> Dict[str, Set[int]]:
+    A = _automaton(kp_norm)
+
+    # One linear pass over all sentences; the newline separator keeps hits inside a sentence
+    text = "\n".join(norm_sents)
+    starts = list(itertools.accumulate((len(s) + 1 for s in norm_sents[:-1]), initial=0))
+    posting: Dict[str, Set[int]] = defaultdict(set)
+    for begin, k in _token_hits(A, text):
+        posting[k].add(bisect_right(starts, begin) - 1)
+    return posting
+
+def _cooccurrence_weights(sentences: List[str], keyphrases: List[str]) -> List[Tuple[str, str, int]]:
     kp_norm = {_normalize(k): k for k in keyphrases}
+    kp_norm.pop("", None)
+    if not kp_norm or not sentences:
+        return []
+
+    # Inverted index: keyphrase -> ids of the sentences containing it
+    norm_sents = [_normalize(s) for s in sentences]
+    if ahocorasick is not None:
+        posting = _postings_automaton(norm_sents, kp_norm)
+    else:
+        posting = _postings_ngram(norm_sents, kp_norm)
+
+    present = [k for k in dict.fromkeys(kp_norm.values()) if posting[k]]
+    if len(present) < 2:
+        return []
+
+    # Flatten the postings to (sentence, keyphrase id) hits sorted by sentence, then by id
+    K = len(present)
+    sizes = [len(posting[k]) for k in present]
+    sids = np.fromiter(itertools.chain.from_iterable(posting[k] for k in present), dtype=np.int64, count=sum(sizes))
+    kids = np.repeat(np.arange(K, dtype=np.int64), sizes)
+    order = np.lexsort((kids, sids))
+    sids, kids = sids[order], kids[order]
+
+    # Tally pairs straight from the hits: the hit d places later pairs with this one when both
+    # share a sentence, so d = 1..(most hits in one sentence - 1) covers every pair once, a < b
+    codes = []
+    for d in range(1, int(np.bincount(sids).max())):
+        same = sids[:-d] == sids[d:]
+        if not same.any():
+            break
+        codes.append(kids[:-d][same] * K + kids[d:][same])
+    if not codes:
+        return []
+    counts = np.bincount(np.concatenate(codes), minlength=K * K)
+
+    # Pair codes a*K+b in ascending order == itertools.combinations(present, 2) order
+    nz = np.flatnonzero(counts)
+    return [(present[c // K], present[c % K], int(counts[c])) for c in nz]
+
+def _sentence_texts(doc) -> List[str]:
+    """Sentence strings of an already parsed Doc (whole text when it has no sentence boundaries)"""
+    if doc.has_annotation("SENT_START") or doc.has_annotation("DEP"):
+        return [sent.text for sent in doc.sents]
+    return [doc.text]
+
+def build_cooccurrence_graph(sentences, keyphrases: List[str]) -> nx.Graph:
+    """sentences: list of sentence strings, or a parsed spaCy Doc shared with extract_svo_edges"""
+    from spacy.tokens import Doc
+    import networkx as nx  # only graph building needs it
+    if isinstance(sentences, Doc):
+        sentences = _sentence_texts(sentences)
     G = nx.Graph()
     for k in keyphrases:
         G.add_node(k)
-    for sent in sentences:
-        s = _normalize(sent)
-        present = [kp_norm[nk] for nk in kp_norm if nk and nk in s]
-        present = list(dict.fromkeys(present))
-        if len(present) > 1:
-            for u, v in itertools.combinations(present, 2):
-                if G.has_edge(u, v):
-                    G[u][v]["weight"] += 1
-                else:
-                    G.add_edge(u, v, weight=1)
+    G.add_weighted_edges_from(_cooccurrence_weights(list(sentences), keyphrases))
     return G
 
-def extract_svo_edges(text: str, keyphrases: List[str], nlp) -> List[Dict]:
-    doc = nlp(text)
-    edges = []
+_SVO_PATTERN = [
+    {"RIGHT_ID": "verb", "RIGHT_ATTRS": {"POS": "VERB"}},
+    {"LEFT_ID": "verb", "REL_OP": ">", "RIGHT_ID": "subj",
+     "RIGHT_ATTRS": {"DEP": {"IN": ["nsubj", "nsubjpass"]}}},
+    {"LEFT_ID": "verb", "REL_OP": ">", "RIGHT_ID": "obj",
+     "RIGHT_ATTRS": {"DEP": {"IN": ["dobj", "attr", "pobj", "dative"]}}},
+]
+_SVO_MATCHERS: Dict[int, object] = {}
+
+def _svo_matcher(vocab):
+    """DependencyMatcher for verb -> subject/object children, compiled once per vocab"""
+    matcher = _SVO_MATCHERS.get(id(vocab))
+    if matcher is None or matcher.vocab is not vocab:
+        from spacy.matcher import DependencyMatcher
+        matcher = DependencyMatcher(vocab)
+        matcher.add("SVO", [_SVO_PATTERN])
+        _SVO_MATCHERS[id(vocab)] = matcher
+    return matcher
+
+def extract_svo_edges(text, keyphrases: List[str], nlp=None) -> List[Dict]:
+    """text: raw string (parsed with nlp) or an already parsed Doc, so callers parse once for both graphs"""
+    from spacy.tokens import Doc
+    merged: Counter = Counter()  # (source, target, label) -> weight
     kp_norm = {_normalize(k): k for k in keyphrases}
+    kp_norm.pop("", None)
+    if not kp_norm:
+        return []
+    doc = text if isinstance(text, Doc) else nlp(text)
+
+    # Longest original keyphrase occurring in the fragment; ties go to the earlier keyphrase
+    rank = {k: i for i, k in enumerate(kp_norm.values())}
+    A = _automaton(kp_norm) if ahocorasick is not None else None
 
     def match_kp(fragment: str):
         fs = _normalize(fragment)
-        matches = [kp_norm[nk] for nk in kp_norm if nk in fs]
+        # Whole-token matches, as for co-occurrence: "models" must not match "modelsmith"
+        if A is not None:
+            # One pass over the fragment instead of an `in` scan per keyphrase
+            matches = {k for _, k in _token_hits(A, fs)}
+        else:
+            padded = f" {fs} "
+            matches = {kp_norm[nk] for nk in kp_norm if f" {nk} " in padded}
         if not matches:
             return None
-        matches.sort(key=len, reverse=True)
-        return matches[0]
-
-    # Requires POS/deps (works best with en_core_web_sm)
-    for sent in getattr(doc, "sents", [doc]):
-        sdoc = nlp(sent.text) if hasattr(nlp, "pipe_names") and "parser" in nlp.pipe_names else doc
-        for token in sdoc:
-            if getattr(token, "pos_", "") == "VERB":
-                subj = None
-                obj = None
-                for child in token.children:
-                    if child.dep_ in ("nsubj", "nsubjpass") and subj is None:
-                        subj = child.subtree
-                    if child.dep_ in ("dobj", "attr", "pobj", "dative") and obj is None:
-                        obj = child.subtree
-                if subj and obj:
-                    s_text = " ".join([t.text for t in subj])
-                    o_text = " ".join([t.text for t in obj])
-                    s_kp = match_kp(s_text)
-                    o_kp = match_kp(o_text)
-                    if s_kp and o_kp and s_kp != o_kp:
-                        edges.append({
-                            "source": s_kp, "target": o_kp,
-                            "label": getattr(token, "lemma_", token.text), "weight": 1
-                        })
-
-    # Merge duplicates
-    merged = {}
-    for e in edges:
-        key = (e["source"], e["target"], e.get("label",""))
-        merged[key] = merged.get(key, 0) + e.get("weight", 1)
-    out = [{"source": s, "target": t, "label": l, "weight": w} for (s, t, l), w in merged.items()]
-    return out
\ No newline at end of file
+        return min(matches, key=lambda k: (-len(k), rank[k]))
+
+    # Requires POS/deps (works best with en_core_web_sm); without a parser there are no SVO triples
+    if not doc.has_annotation("DEP"):
+        return []
+
+    # One native dependency-tree match instead of a Python walk over every token's children;
+    # like the old walk, each verb keeps its first subject and first object child
+    svo: Dict[int, Tuple[int, int]] = {}
+    for _, (v, s_i, o_i) in _svo_matcher(doc.vocab)(doc):
+        if v in svo:
+            prev_s, prev_o = svo[v]
+            s_i, o_i = min(s_i, prev_s), min(o_i, prev_o)
+        svo[v] = (s_i, o_i)
+
+    for v, (s_i, o_i) in sorted(svo.items()):
+        s_kp = match_kp(" ".join(t.text for t in doc[s_i].subtree))
+        o_kp = match_kp(" ".join(t.text for t in doc[o_i].subtree))
+        if s_kp and o_kp and s_kp != o_kp:
+            # Duplicates merge as they are found, no edge dicts to fold afterwards
+            verb = doc[v]
+            merged[(s_kp, o_kp, getattr(verb, "lemma_", verb.text))] += 1
+
+    return [{"source": s, "target": t, "label": l, "weight": w} for (s, t, l), w in merged.items()]
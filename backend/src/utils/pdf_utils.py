@@ -1,9 +1,25 @@
 # src/utils/pdf_utils.py
 import os
+import logging
+import tempfile
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 from PIL import Image
 
+logger = logging.getLogger(__name__)
+
+# poppler render threads; pdf2image splits each page range across them
+PDF_RENDER_THREADS = int(os.getenv("PDF_RENDER_THREADS", max(1, (os.cpu_count() or 2) - 1)))
+
+def _import_fitz():
+    """PyMuPDF if installed: renders in-process straight into PIL, no image-file round-trip"""
+    try:
+        import fitz
+        return fitz
+    except ImportError:
+        return None
+
+
 def pdf_to_images(pdf_path: str, dpi: int = 300) -> List[Image.Image]:
     """
     Convert PDF pages to PIL Images
@@ -15,6 +31,10 @@ def pdf_to_images(pdf_path: str, dpi: int = 300) -> List[Image.Image]:
     Returns:
         List of PIL Image objects, one per page
     """
+    fitz = _import_fitz()
+    if fitz is not None:
+        return list(_iter_fitz_pages(fitz, Path(pdf_path).read_bytes(), dpi, grayscale=False))
+
     try:
         # Try using pdf2image (requires poppler)
         from pdf2image import convert_from_path
@@ -26,11 +46,12 @@ def pdf_to_images(pdf_path: str, dpi: int = 300) -> List[Image.Image]:
             images = convert_from_path(
                 pdf_path,
                 dpi=dpi,
-                poppler_path=poppler_path
+                poppler_path=poppler_path,
+                thread_count=PDF_RENDER_THREADS
             )
         else:
             # Try without poppler_path (works on Linux/Mac)
-            images = convert_from_path(pdf_path, dpi=dpi)
+            images = convert_from_path(pdf_path, dpi=dpi, thread_count=PDF_RENDER_THREADS)
         
         return images
         
@@ -41,3 +62,148 @@ def pdf_to_images(pdf_path: str, dpi: int = 300) -> List[Image.Image]:
         )
     except Exception as e:
         raise Exception(f"Failed to convert PDF to images: {e}")
+
+
+
+def pdf_bytes_to_images(pdf_bytes: bytes, dpi: int = 300) -> List[Image.Image]:
+    """
+    Convert in-memory PDF bytes to PIL Images
+    
+    Args:
+        pdf_bytes: Raw PDF file contents
+        dpi: Resolution for conversion (default 300)
+    
+    Returns:
+        List of PIL Image objects, one per page
+    """
+    fitz = _import_fitz()
+    if fitz is not None:
+        return list(_iter_fitz_pages(fitz, pdf_bytes, dpi, grayscale=False))
+
+    try:
+        from pdf2image import convert_from_bytes
+        
+        poppler_path = os.getenv("POPPLER_PATH")
+        
+        if poppler_path and os.path.exists(poppler_path):
+            return convert_from_bytes(
+                pdf_bytes, dpi=dpi, poppler_path=poppler_path, thread_count=PDF_RENDER_THREADS
+            )
+        return convert_from_bytes(pdf_bytes, dpi=dpi, thread_count=PDF_RENDER_THREADS)
+        
+    except ImportError:
+        raise ImportError(
+            "pdf2image not installed. Install with: pip install pdf2image\n"
+            "Also requires poppler: https://github.com/oschwartz10612/poppler-windows/releases/"
+        )
+    except Exception as e:
+        raise Exception(f"Failed to convert PDF to images: {e}")
+
+
+def pdf_page_count(pdf_bytes: bytes) -> int:
+    """Number of pages in an in-memory PDF (PyMuPDF, else poppler's pdfinfo)"""
+    try:
+        import fitz
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return doc.page_count
+    except ImportError:
+        from pdf2image import pdfinfo_from_bytes
+        return int(pdfinfo_from_bytes(pdf_bytes)["Pages"])
+
+
+def iter_pdf_bytes_pages(
+    pdf_bytes: bytes,
+    dpi: int = 300,
+    chunk_pages: int = 2,
+    renderer: str = "fitz",
+    grayscale: bool = False,
+) -> Iterator[Image.Image]:
+    """
+    Render in-memory PDF bytes lazily, a few pages at a time
+    
+    Args:
+        pdf_bytes: Raw PDF file contents
+        dpi: Resolution for conversion (default 300)
+        chunk_pages: Pages rendered per poppler call (raised to PDF_RENDER_THREADS)
+        renderer: "fitz" renders in-process with PyMuPDF; "poppler" (or no PyMuPDF) uses pdf2image
+        grayscale: Render single-channel pages (PyMuPDF only)
+    
+    Yields:
+        PIL Image objects in page order
+    """
+    if renderer == "fitz":
+        try:
+            import fitz
+        except ImportError:
+            logger.warning("PyMuPDF not installed, rendering PDF with poppler")
+        else:
+            yield from _iter_fitz_pages(fitz, pdf_bytes, dpi, grayscale)
+            return
+    
+    try:
+        from pdf2image import convert_from_path, pdfinfo_from_path
+    except ImportError:
+        raise ImportError(
+            "pdf2image not installed. Install with: pip install pdf2image\n"
+            "Also requires poppler: https://github.com/oschwartz10612/poppler-windows/releases/"
+        )
+    
+    poppler_path = os.getenv("POPPLER_PATH")
+    if not (poppler_path and os.path.exists(poppler_path)):
+        poppler_path = None
+    
+    # Write the PDF once; each chunk renders from the same file
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_path = os.path.join(tmpdir, "input.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        
+        try:
+            page_count = int(pdfinfo_from_path(pdf_path, poppler_path=poppler_path)["Pages"])
+        except Exception as e:
+            raise Exception(f"Failed to convert PDF to images: {e}")
+        
+        chunk_pages = max(chunk_pages, PDF_RENDER_THREADS)
+        for first in range(1, page_count + 1, chunk_pages):
+            last = min(first + chunk_pages - 1, page_count)
+            try:
+                # Threads write pages straight to tmpdir; decode them one at a time below
+                paths = convert_from_path(
+                    pdf_path, dpi=dpi, first_page=first, last_page=last, poppler_path=poppler_path,
+                    thread_count=min(PDF_RENDER_THREADS, last - first + 1),
+                    output_folder=tmpdir, paths_only=True,
+                )
+            except Exception as e:
+                raise Exception(f"Failed to convert PDF to images: {e}")
+            for path in paths:
+                page = Image.open(path)
+                page.load()  # decodes and releases the file
+                os.remove(path)
+                yield page
+
+
+def _iter_fitz_pages(fitz, pdf_bytes: bytes, dpi: int, grayscale: bool) -> Iterator[Image.Image]:
+    # No subprocess or temp files: pixmap samples go straight into a PIL image
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise Exception(f"Failed to convert PDF to images: {e}")
+    try:
+        for page in doc:
+            yield render_fitz_page(fitz, page, dpi, grayscale)
+    finally:
+        doc.close()
+
+
+def render_fitz_page(fitz, page, dpi: int, grayscale: bool = False) -> Image.Image:
+    """Rasterize one PyMuPDF page into a PIL image without an encode/decode step"""
+    mode, colorspace = ("L", fitz.csGRAY) if grayscale else ("RGB", fitz.csRGB)
+    pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+    # Read the pixmap through its memoryview: pix.samples would first copy it into a bytes object
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    if img.readonly:
+        # "L" pages map the buffer in place, but it dies with pix: take the one copy we need
+        # and drop the mapping first so the pixmap can release its memoryview
+        mapped, img = img, img.copy()
+        del mapped
+    return img
@@ -0,0 +1,72 @@
+# tests/test_cache.py
+import threading
+
+from services import cache as cache_mod
+from services.cache import _MemoryCache, content_key, get_cache, get_json, set_json
+
+
+def test_content_key_is_stable_and_separates_parts():
+    assert content_key("a", b"b", 3) == content_key("a", b"b", 3)
+    assert content_key("ab", "c") != content_key("a", "bc")
+    assert content_key("é") == content_key("é".encode("utf-8"))
+    assert len(content_key("x")) == 64
+
+
+def test_memory_cache_evicts_least_recently_used():
+    c = _MemoryCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "a" is now the most recent
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.get("missing", "dflt") == "dflt"
+
+
+def test_memory_cache_is_thread_safe():
+    c = _MemoryCache(maxsize=50)
+
+    def writer(base):
+        for i in range(500):
+            c.set(f"{base}-{i}", i)
+            c.get(f"{base}-{i // 2}")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(c._data) == 50
+
+
+def test_json_round_trip():
+    c = _MemoryCache()
+    value = {"text": "café", "scores": [1.0, 0.5], "nested": {"ok": True}}
+    set_json(c, "k", value)
+    assert get_json(c, "k") == value
+    assert get_json(c, "missing") is None
+
+
+def test_get_json_ignores_corrupt_entries():
+    c = _MemoryCache()
+    c.set("k", b"{not json")
+    assert get_json(c, "k") is None
+
+
+def test_set_json_never_raises():
+    class Broken:
+        def set(self, *args, **kwargs):
+            raise OSError("disk full")
+
+    set_json(Broken(), "k", {"a": 1})
+    set_json(_MemoryCache(), "k", object())  # not serializable: logged, not raised
+
+
+def test_get_cache_returns_one_instance_per_name(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_mod, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache_mod, "_CACHES", {})
+    first = get_cache("test")
+    assert get_cache("test") is first
+    assert get_cache("other") is not first
+    set_json(first, "k", [1, 2])
+    assert get_json(get_cache("test"), "k") == [1, 2]
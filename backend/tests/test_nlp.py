@@ -0,0 +1,186 @@
+# tests/test_nlp.py
+import networkx as nx
+import pytest
+import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
+
+from services.cache import _MemoryCache
+from src.nlp import relationships
+from src.nlp.extract import parse_cached, pipe_cached
+from src.nlp.hierarchy import build_hierarchy_tree
+from src.nlp.relationships import build_cooccurrence_graph, extract_svo_edges
+
+PARSE_CALLS = []
+
+
+@Language.component("count_parses")
+def count_parses(doc):
+    PARSE_CALLS.append(doc.text)
+    return doc
+
+
+@pytest.fixture
+def nlp():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("count_parses")
+    PARSE_CALLS.clear()
+    return nlp
+
+
+# ========== DocBin PARSE CACHE ==========
+def test_parse_cached_reuses_serialized_doc(nlp):
+    cache = _MemoryCache()
+    text = "Neural networks learn features. Graphs have nodes."
+    first = parse_cached(nlp, text, cache)
+    second = parse_cached(nlp, text, cache)
+    assert PARSE_CALLS == [text]
+    assert second is not first
+    assert [s.text for s in second.sents] == [s.text for s in first.sents]
+
+
+def test_parse_cached_keys_on_disabled_pipes(nlp):
+    cache = _MemoryCache()
+    parse_cached(nlp, "Same text.", cache)
+    parse_cached(nlp, "Same text.", cache, disable=["sentencizer"])
+    parse_cached(nlp, "Same text.", cache, disable=["not_in_pipeline"])  # ignored: same key as no disable
+    assert PARSE_CALLS == ["Same text.", "Same text."]
+
+
+def test_parse_cached_without_cache_always_parses(nlp):
+    parse_cached(nlp, "Again.", None)
+    parse_cached(nlp, "Again.", None)
+    assert PARSE_CALLS == ["Again.", "Again."]
+
+
+def test_parse_cached_survives_bad_cache_entry(nlp):
+    class Corrupt(_MemoryCache):
+        def get(self, key, default=None):
+            return b"not a docbin"
+
+    doc = parse_cached(nlp, "Still parses.", Corrupt())
+    assert doc.text == "Still parses."
+
+
+def test_pipe_cached_mixes_hits_and_misses_in_order(nlp):
+    cache = _MemoryCache()
+    parse_cached(nlp, "b text.", cache)
+    PARSE_CALLS.clear()
+    docs = pipe_cached(nlp, ["a text.", "b text.", "c text."], cache)
+    assert [d.text for d in docs] == ["a text.", "b text.", "c text."]
+    assert PARSE_CALLS == ["a text.", "c text."]
+    # Misses were stored: a second batch parses nothing
+    pipe_cached(nlp, ["c text.", "a text."], cache)
+    assert PARSE_CALLS == ["a text.", "c text."]
+
+
+# ========== GRAPHS: REGRESSION AGAINST THE BASELINE IMPLEMENTATION ==========
+# Expected values were produced by the original per-sentence substring scan (commit 934d372);
+# keyphrases sit on word boundaries, where it agrees with today's whole-token matching
+SENTENCES = [
+    "Machine learning models learn patterns from training data.",
+    "Neural networks are machine learning models built from layers.",
+    "Training data quality limits what neural networks can learn.",
+    "Gradient descent trains neural networks on training data.",
+    "Machine learning needs training data, and gradient descent needs a loss function.",
+    "A loss function scores machine learning models.",
+    "Graph theory studies trees and graphs.",
+    "Spanning trees are a topic in graph theory.",
+]
+KEYPHRASES = [
+    "machine learning", "training data", "neural networks", "gradient descent",
+    "loss function", "models", "graph theory", "spanning trees", "decision trees",
+]
+BASELINE_COOCCURRENCE = [
+    ("gradient descent", "loss function", 1),
+    ("gradient descent", "machine learning", 1),
+    ("gradient descent", "neural networks", 1),
+    ("gradient descent", "training data", 2),
+    ("graph theory", "spanning trees", 1),
+    ("loss function", "machine learning", 2),
+    ("loss function", "models", 1),
+    ("loss function", "training data", 1),
+    ("machine learning", "models", 3),
+    ("machine learning", "neural networks", 1),
+    ("machine learning", "training data", 2),
+    ("models", "neural networks", 1),
+    ("models", "training data", 1),
+    ("neural networks", "training data", 2),
+]
+
+# Bridge-then-spanning-tree hierarchy of the graph above, from the same baseline
+BASELINE_HIERARCHY = [
+    ("graph theory", "spanning trees", 1),
+    ("machine learning", "decision trees", 0.0001),
+    ("machine learning", "graph theory", 0.0001),
+    ("machine learning", "loss function", 2),
+    ("machine learning", "models", 3),
+    ("machine learning", "training data", 2),
+    ("training data", "gradient descent", 2),
+    ("training data", "neural networks", 2),
+]
+
+
+def _undirected_edges(G):
+    return sorted((*sorted((u, v)), d["weight"]) for u, v, d in G.edges(data=True))
+
+
+@pytest.fixture(params=["automaton", "ngram"])
+def matcher(request, monkeypatch):
+    """Run a test with pyahocorasick and again with the token n-gram fallback"""
+    if request.param == "automaton":
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setattr(relationships, "ahocorasick", None)
+    return request.param
+
+
+def test_cooccurrence_graph_matches_baseline(matcher):
+    G = build_cooccurrence_graph(SENTENCES, KEYPHRASES)
+    assert list(G.nodes) == KEYPHRASES
+    assert _undirected_edges(G) == BASELINE_COOCCURRENCE
+
+
+def test_cooccurrence_graph_accepts_parsed_doc(nlp):
+    doc = nlp(" ".join(SENTENCES))
+    assert _undirected_edges(build_cooccurrence_graph(doc, KEYPHRASES)) == BASELINE_COOCCURRENCE
+
+
+def test_cooccurrence_graph_matches_whole_tokens_only(matcher):
+    G = build_cooccurrence_graph(["Modelsmith models data.", "datasets and models"], ["models", "data"])
+    assert _undirected_edges(G) == [("data", "models", 1)]
+
+
+def _svo_doc(subject: str) -> Doc:
+    # "<subject> trains data": verb -> nsubj / dobj, built by hand so no trained parser is needed
+    nlp = spacy.blank("en")
+    return Doc(
+        nlp.vocab,
+        words=[subject, "trains", "data"],
+        lemmas=[subject.lower(), "train", "data"],
+        pos=["NOUN", "VERB", "NOUN"],
+        deps=["nsubj", "ROOT", "dobj"],
+        heads=[1, 1, 1],
+    )
+
+
+def test_svo_edges_match_whole_tokens_only(matcher):
+    assert extract_svo_edges(_svo_doc("Models"), ["models", "data"]) == [
+        {"source": "models", "target": "data", "label": "train", "weight": 1}
+    ]
+    # Same rule as co-occurrence: "models" is not a token of "Modelsmith"
+    assert extract_svo_edges(_svo_doc("Modelsmith"), ["models", "data"]) == []
+
+
+def test_hierarchy_tree_matches_baseline():
+    G = build_cooccurrence_graph(SENTENCES, KEYPHRASES)
+    before = _undirected_edges(G)
+    T = build_hierarchy_tree(G)
+    assert sorted((u, v, d["weight"]) for u, v, d in T.edges(data=True)) == BASELINE_HIERARCHY
+    assert nx.is_arborescence(T)
+    assert _undirected_edges(G) == before  # the co-occurrence graph is not mutated
+
+
+def test_hierarchy_tree_of_empty_graph():
+    assert build_hierarchy_tree(nx.Graph()).number_of_nodes() == 0
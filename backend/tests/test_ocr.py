@@ -0,0 +1,101 @@
+# tests/test_ocr.py
+import io
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image, ImageDraw
+
+from services import ocr
+from services.ocr import encode_for_vision
+from src.ocr.preprocess import preprocess_for_ocr
+
+
+def _ruled_page(angle: float = 0.0) -> Image.Image:
+    """Grayscale page of dark text-like bars, optionally rotated by a few degrees"""
+    img = Image.new("L", (600, 400), 255)
+    draw = ImageDraw.Draw(img)
+    for y in range(40, 380, 30):
+        draw.rectangle([40, y, 560, y + 8], fill=0)
+    if angle:
+        img = img.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+    return img
+
+
+def test_rotated_page_stays_binary_and_goes_out_as_png():
+    page = preprocess_for_ocr(_ruled_page(3.0), deskew=True, denoise=True, binarize=True)
+    assert page.getcolors(2) is not None
+    out = Image.open(io.BytesIO(encode_for_vision(page)))
+    assert out.format == "PNG" and out.mode == "1"
+
+
+def test_vision_payloads_are_images_annotate_formats():
+    # images:annotate accepts JPEG/PNG/GIF/BMP/WEBP/RAW/ICO; TIFF and PDF need files:annotate
+    for page in (_ruled_page(3.0), preprocess_for_ocr(_ruled_page(3.0))):
+        assert Image.open(io.BytesIO(encode_for_vision(page))).format in {"JPEG", "PNG"}
+
+
+def test_grayscale_page_goes_out_as_jpeg():
+    page = _ruled_page(3.0)  # bicubic rotation leaves anti-aliased edges
+    assert Image.open(io.BytesIO(encode_for_vision(page))).format == "JPEG"
+
+
+def test_encode_for_vision_downscales_to_max_side():
+    page = preprocess_for_ocr(_ruled_page(), deskew=False, denoise=False, binarize=True)
+    out = Image.open(io.BytesIO(encode_for_vision(page, max_side=300)))
+    assert max(out.size) == 300
+
+
+# ========== TESSERACT ENGINE POOL ==========
+class _FakeTessAPI:
+    created = []
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.busy = False
+        _FakeTessAPI.created.append(self)
+
+    def SetImage(self, img):
+        assert not self.busy, "engine shared by two threads"
+        self.busy = True
+        self.size = img.size
+
+    def GetUTF8Text(self):
+        time.sleep(0.002)
+        self.busy = False
+        return f"{self.lang} {self.size[0]}"
+
+
+@pytest.fixture
+def fake_tesserocr(monkeypatch):
+    _FakeTessAPI.created = []
+    monkeypatch.setitem(sys.modules, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=_FakeTessAPI))
+    monkeypatch.setattr(ocr, "_TESS_POOLS", {})
+    monkeypatch.setattr(ocr, "TESS_POOL_SIZE", 3)
+
+
+def test_tesseract_engines_outlive_request_threads(fake_tesserocr):
+    # One short-lived thread per call, like Flask's thread per request
+    for _ in range(5):
+        t = threading.Thread(target=ocr.tesseract_extract_text, args=(Image.new("L", (8, 8)), "eng"))
+        t.start()
+        t.join()
+    assert len(_FakeTessAPI.created) == 1
+
+
+def test_tesseract_engine_pool_is_bounded_and_exclusive(fake_tesserocr):
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        texts = list(executor.map(
+            lambda n: ocr.tesseract_extract_text(Image.new("L", (n + 1, 8)), "eng"), range(40)
+        ))
+    assert texts == [f"eng {n + 1}" for n in range(40)]
+    assert 1 <= len(_FakeTessAPI.created) <= 3
+
+
+def test_tesseract_pools_are_per_language(fake_tesserocr):
+    ocr.tesseract_extract_text(Image.new("L", (8, 8)), "eng")
+    ocr.tesseract_extract_text(Image.new("L", (8, 8)), "deu")
+    assert sorted(api.lang for api in _FakeTessAPI.created) == ["deu", "eng"]
@@ -0,0 +1,219 @@
+# tests/test_ocr_pipeline.py
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from services import cache as cache_mod
+from services import ocr_pipeline
+from services.ocr_pipeline import (
+    OCRConfig,
+    _run_page_pipeline,
+    cleanup_text,
+    extract_text_from_bytes,
+    sniff_file_kind,
+    strip_headers_footers_by_frequency,
+)
+
+
+def _encoded(fmt: str) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4), "white").save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _pdf(n_pages: int) -> bytes:
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for n in range(n_pages):
+        # Page width encodes the page number, so results can be traced back to their page
+        page = doc.new_page(width=200 + 10 * n, height=200)
+        page.insert_text((20, 100), f"Page {n + 1}", fontsize=20)
+    return doc.tobytes()
+
+
+# ========== UPLOAD SNIFFING ==========
+@pytest.mark.parametrize("fmt, kind", [
+    ("PNG", "png"), ("JPEG", "jpg"), ("TIFF", "tiff"), ("GIF", "gif"), ("BMP", "bmp"), ("WEBP", "webp"),
+])
+def test_sniff_file_kind_images(fmt, kind):
+    assert sniff_file_kind(_encoded(fmt)[:ocr_pipeline.SNIFF_BYTES]) == kind
+
+
+def test_sniff_file_kind_pdf_with_leading_junk():
+    assert sniff_file_kind(b"%PDF-1.7\n%\xe2\xe3") == "pdf"
+    assert sniff_file_kind(b"\xef\xbb\xbf\r\n%PDF-1.4\n") == "pdf"  # BOM/whitespace before the header
+
+
+@pytest.mark.parametrize("head", [b"", b"hello world", b"PK\x03\x04", b"<html><body>"])
+def test_sniff_file_kind_rejects_other_files(head):
+    assert sniff_file_kind(head) is None
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """Tesseract config whose per-page OCR just reports the page width; fresh OCR cache"""
+    monkeypatch.setattr(cache_mod, "_CACHES", {})
+    monkeypatch.setattr(ocr_pipeline, "OCR_PROCESSES", 1)
+    monkeypatch.setattr(ocr_pipeline, "extract_text_from_image", lambda img, config: f"width {img.width}")
+    return OCRConfig(engine="tesseract", dpi=72, deskew=False, denoise=False, binarize=False)
+
+
+def test_renamed_pdf_is_routed_as_pdf(fake_ocr):
+    text = extract_text_from_bytes(_pdf(2), "scan.png", fake_ocr)
+    assert text == "--- Page 1 ---\nwidth 200\n\n--- Page 2 ---\nwidth 210"
+
+
+def test_image_named_pdf_is_routed_as_image(fake_ocr):
+    assert extract_text_from_bytes(_encoded("PNG"), "notes.pdf", fake_ocr) == "width 4"
+
+
+def test_sniffed_kind_passed_by_the_caller_wins(fake_ocr):
+    assert extract_text_from_bytes(_pdf(1), "upload", fake_ocr, "pdf").startswith("--- Page 1 ---")
+
+
+# ========== PAGE PIPELINE ==========
+def test_run_page_pipeline_keeps_page_order(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "OCR_CONCURRENCY", 4)
+
+    def work(n):
+        time.sleep(0.001 * (10 - n % 10))  # later pages finish first
+        return n * n
+
+    assert _run_page_pipeline(iter(range(25)), work) == [n * n for n in range(25)]
+
+
+def test_run_page_pipeline_bounds_rendered_pages(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "OCR_CONCURRENCY", 2)
+    lock = threading.Lock()
+    state = {"rendered": 0, "done": 0, "peak": 0}
+
+    def pages():
+        for n in range(30):
+            with lock:
+                state["rendered"] += 1
+                state["peak"] = max(state["peak"], state["rendered"] - state["done"])
+            yield n
+
+    def work(n):
+        time.sleep(0.002)
+        with lock:
+            state["done"] += 1
+        return n
+
+    assert _run_page_pipeline(pages(), work) == list(range(30))
+    # queued pages + one in each worker's hands + the one the producer is blocked on
+    assert state["peak"] <= ocr_pipeline.PAGE_QUEUE_SIZE + 2 + 1
+
+
+def test_run_page_pipeline_failed_page_is_none():
+    def work(n):
+        if n == 2:
+            raise ValueError("bad page")
+        return n
+
+    assert _run_page_pipeline(iter(range(4)), work) == [0, 1, None, 3]
+
+
+def test_run_page_pipeline_reraises_render_errors():
+    def pages():
+        yield 0
+        raise RuntimeError("renderer crashed")
+
+    with pytest.raises(RuntimeError):
+        _run_page_pipeline(pages(), lambda n: n)
+
+
+# ========== PROCESS-PARALLEL PDF OCR ==========
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "OCR_PROCESSES", 2)
+    yield
+    pool = ocr_pipeline._PROCESS_POOL
+    ocr_pipeline._PROCESS_POOL = None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def test_render_ocr_pages_covers_its_range_in_order(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "extract_text_from_image", lambda img, config: str(img.width))
+    config = OCRConfig(engine="tesseract", dpi=72)
+    assert ocr_pipeline._render_ocr_pages((_pdf(5), 1, 4, config)) == ["210", "220", "230"]
+
+
+def test_process_pool_is_opt_in(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "OCR_PROCESSES", 1)
+    assert ocr_pipeline._render_and_ocr_pdf(_pdf(3), OCRConfig(engine="tesseract", dpi=72)) is None
+    assert ocr_pipeline._PROCESS_POOL is None
+
+
+def test_process_pool_skips_poppler_renderer(process_pool):
+    config = OCRConfig(engine="tesseract", renderer="poppler")
+    assert ocr_pipeline._render_and_ocr_pdf(_pdf(3), config) is None
+
+
+def test_process_pool_returns_one_text_per_page(process_pool):
+    # Without Tesseract installed the pages come back empty; count, order and pooling still hold
+    config = OCRConfig(engine="tesseract", dpi=72)
+    texts = ocr_pipeline._render_and_ocr_pdf(_pdf(5), config)
+    assert texts is not None and len(texts) == 5
+    assert all(t is None or isinstance(t, str) for t in texts)
+
+    pool = ocr_pipeline._PROCESS_POOL
+    assert pool is not None and pool._mp_context.get_start_method() == "spawn"
+    # The pool is shared: a second PDF reuses it instead of starting new processes
+    assert len(ocr_pipeline._render_and_ocr_pdf(_pdf(3), config)) == 3
+    assert ocr_pipeline._PROCESS_POOL is pool
+
+
+# ========== HEADERS / FOOTERS ==========
+
+
+def _page(n: int, body: list[str]) -> str:
+    return "\n".join(["ACME Corp Handbook", *body, f"Page {n}", "Confidential"])
+
+
+def test_strip_headers_footers_removes_repeated_edge_lines():
+    pages = [_page(n, [f"Body line {n}.{k}" for k in range(5)]) for n in range(1, 5)]
+    out = strip_headers_footers_by_frequency(pages)
+    for n, text in enumerate(out, 1):
+        lines = text.splitlines()
+        assert "ACME Corp Handbook" not in lines
+        assert "Confidential" not in lines
+        assert lines == [f"Body line {n}.{k}" for k in range(5)] + [f"Page {n}"]
+
+
+def test_strip_headers_footers_keeps_short_pages():
+    # Slides / flash cards: every line is within EDGE_LINES of an edge, and all of it is content
+    pages = ["Definitions\nEntropy\nSee glossary"] * 4
+    assert strip_headers_footers_by_frequency(pages) == pages
+
+
+def test_strip_headers_footers_leaves_short_pages_alone_in_long_documents():
+    long_pages = [_page(n, [f"Body line {n}.{k}" for k in range(5)]) for n in range(1, 5)]
+    short = "ACME Corp Handbook\nSummary\nConfidential"
+    out = strip_headers_footers_by_frequency(long_pages + [short])
+    assert out[-1] == short
+    assert "ACME Corp Handbook" not in out[0]
+
+
+def test_strip_headers_footers_needs_three_pages():
+    pages = [_page(1, ["a"] * 5), _page(2, ["b"] * 5)]
+    assert strip_headers_footers_by_frequency(pages) == pages
+
+
+def test_cleanup_text_rejoins_hyphenated_words():
+    assert cleanup_text("the hyph-\nenated word") == "the hyphenated word"
+
+
+def test_cleanup_text_keeps_hyphen_before_space_or_capital():
+    assert cleanup_text("well-\n known") == "well-\nknown"
+    assert cleanup_text("Jean-\nPaul") == "Jean-\nPaul"
+
+
+def test_cleanup_text_whitespace_matches_line_strip():
+    # Blank runs collapse before lines are stripped, so whitespace-only lines still count
+    assert cleanup_text("  a  b \n \n \n c\t") == "a b\n\n\nc"
+    assert cleanup_text("a\n\n\n\nb") == "a\n\nb"